@@ -0,0 +1,53 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from recipes.versions import get_versions, user_scope
+
+
+def get_validators(view, request):
+    """
+    ETag и Last-Modified ответа по версиям данных представления
+    и, для авторизованных, версии состояния пользователя.
+    Тело ответа для этого не нужно.
+    """
+    scopes = list(view.version_scopes)
+    user = request.user
+    if view.user_state and user.is_authenticated:
+        scopes.append(user_scope(user.id))
+    versions = get_versions(*scopes)
+    identity = user.id if view.user_state and user.is_authenticated else ''
+    digest = hashlib.md5(
+        f'{request.get_full_path()}|{identity}|{versions}'.encode()
+    ).hexdigest()
+    return quote_etag(digest), max(versions)
+
+
+def conditional_get(view_method):
+    """
+    Отвечает 304 на If-None-Match / If-Modified-Since до вызова
+    представления и добавляет валидаторы к успешным ответам.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = get_validators(self, request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified))
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        if request.user.is_authenticated and self.user_state:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True,
+                max_age=settings.PUBLIC_CACHE_MAX_AGE)
+        return response
+    return wrapper
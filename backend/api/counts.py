@@ -0,0 +1,67 @@
+import hashlib
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import QuerySet
+from recipes.paginators import estimate_count
+from recipes.versions import get_versions, user_scope
+
+from .response_cache import get_cache
+
+PAGE_PARAMS = ('page', 'limit', 'cursor')
+CACHED = 'cached'
+ESTIMATED = 'estimated'
+EXACT = 'exact'
+
+
+def count_key(request, view):
+    """
+    Ключ числа объектов: представление, фильтры без параметров
+    страницы и версии данных. Для представлений без version_scopes
+    числа не кешируются.
+    """
+    scopes = getattr(view, 'version_scopes', None)
+    if scopes is None:
+        return None
+    scopes = list(scopes)
+    user = request.user
+    identity = ''
+    if getattr(view, 'user_state', False) and user.is_authenticated:
+        scopes.append(user_scope(user.id))
+        identity = user.id
+    params = sorted(
+        (name, sorted(request.query_params.getlist(name)))
+        for name in request.query_params if name not in PAGE_PARAMS
+    )
+    digest = hashlib.md5(
+        f'{request.path}|{identity}|{params}|'
+        f'{get_versions(*scopes)}'.encode()
+    ).hexdigest()
+    return f'count:{digest}'
+
+
+def count_objects(queryset, request, view):
+    """
+    Число объектов и способ, которым оно получено: из кеша, оценкой
+    планировщика (на Postgres выше порога COUNT_ESTIMATE_THRESHOLD)
+    или точным COUNT(*). Точные и оценочные значения кешируются
+    до изменения версий данных. Для готового списка - его длина.
+    """
+    if not isinstance(queryset, QuerySet):
+        return len(queryset), EXACT
+    key = count_key(request, view)
+    if key is not None:
+        cached = get_cache().get(key)
+        if cached is not None:
+            return cached[0], CACHED
+    count, strategy = None, EXACT
+    if connections[queryset.db].vendor == 'postgresql':
+        estimate = estimate_count(queryset)
+        if estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+            count, strategy = estimate, ESTIMATED
+    if count is None:
+        count = queryset.count()
+    if key is not None:
+        get_cache().set(
+            key, (count, strategy), timeout=settings.COUNT_CACHE_TIMEOUT)
+    return count, strategy
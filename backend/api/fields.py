@@ -1,6 +1,7 @@
 import base64
 
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from rest_framework import fields
 
 
@@ -13,3 +14,25 @@ class Base64ImageField(fields.ImageField):
             data = ContentFile(base64.b64decode(imgstr), name='photo.' + ext)
 
         return super().to_internal_value(data)
+
+
+class ImageVariantsField(fields.Field):
+    """
+    Ссылки на уменьшенные копии изображения:
+    {размер: {расширение: url}}.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        representation = {}
+        for size, files in value.items():
+            representation[size] = {}
+            for extension, name in files.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                representation[size][extension] = url
+        return representation
@@ -1,15 +1,63 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import BooleanField, Case, Q, Value, When
 from django_filters.rest_framework import FilterSet, filters
+from recipes.indexes import ingredient_trigram_index, recipe_trigram_index
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import full_text_search
+from recipes.tag_masks import filter_by_tags
 from users.models import User
 
+SEARCH_LIMIT = 100
+
+
+def annotate_is_prefix(queryset, value):
+    return queryset.annotate(is_prefix=Case(
+        When(name__istartswith=value, then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField()
+    ))
+
+
+def trigram_search(queryset, value, index):
+    """
+    Нечеткий поиск по названию: сначала совпадения по префиксу,
+    затем по убыванию триграммного сходства, не больше SEARCH_LIMIT.
+    В Postgres работает pg_trgm: сходство ищется по GIN-индексу
+    на name, подстрока (icontains) - по индексу на UPPER(name).
+    В остальных БД - индекс в памяти.
+    """
+    if connection.vendor == 'postgresql':
+        ranked = annotate_is_prefix(queryset, value).annotate(
+            similarity=TrigramSimilarity('name', value)
+        ).order_by('-is_prefix', '-similarity', 'name')
+        matches = ranked.filter(
+            Q(name__trigram_similar=value) | Q(name__icontains=value))
+        return ranked.filter(pk__in=matches.values('pk')[:SEARCH_LIMIT])
+    ids = index.search(value, SEARCH_LIMIT)
+    if ids is None:
+        return annotate_is_prefix(
+            queryset.filter(name__icontains=value), value
+        ).order_by('-is_prefix', 'name')
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *(When(pk=pk, then=Value(position))
+          for position, pk in enumerate(ids))
+    ))
+
 
 class IngredientFilter(FilterSet):
     """Фильтр по названию ингредиента"""
     name = filters.CharFilter(lookup_expr='istartswith')
+    search = filters.CharFilter(method='search_filter')
+
+    def search_filter(self, queryset, name, value):
+        return trigram_search(queryset, value, ingredient_trigram_index)
 
     class Meta:
         model = Ingredient
-        fields = ('name',)
+        fields = ('name', 'search')
 
 
 class RecipeFilter(FilterSet):
@@ -17,7 +65,8 @@ class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='tags_filter'
     )
     author = filters.ModelChoiceFilter(
         queryset=User.objects.all()
@@ -25,19 +74,33 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(method='is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='is_in_shopping_cart_filter')
+    search = filters.CharFilter(method='search_filter')
+    q = filters.CharFilter(method='full_text_filter')
+
+    def tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+        return filter_by_tags(queryset, value)
+
+    def search_filter(self, queryset, name, value):
+        return trigram_search(queryset, value, recipe_trigram_index)
+
+    def full_text_filter(self, queryset, name, value):
+        return full_text_search(queryset, value)
 
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(recipe_favorite__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def is_in_shopping_cart_filter(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(recipe_shopping__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'q')
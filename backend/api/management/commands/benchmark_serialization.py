@@ -0,0 +1,99 @@
+import time
+
+from api.views import RecipeViewSet, SubscriptionViewSet, UserViewSet
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+ENDPOINTS = (
+    ('Рецепты', RecipeViewSet, '/api/recipes/'),
+    ('Подписки', SubscriptionViewSet, '/api/users/subscriptions/'),
+    ('Пользователи', UserViewSet, '/api/users/'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнение сериализаторов DRF и быстрых представлений '
+            'списков: время построения JSON одной страницы и число '
+            'страниц в секунду на один воркер без учета БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Объектов на странице'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Сколько раз строить каждую страницу'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Id читателя, по умолчанию - с наибольшим числом подписок'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        renderer = JSONRenderer()
+        for title, view_class, path in ENDPOINTS:
+            view = self.make_view(
+                view_class, f'{path}?limit={options["limit"]}', user)
+            page = list(view.paginate_queryset(
+                view.filter_queryset(view.get_queryset())))
+            serializer_class = view.get_serializer_class()
+            context = view.get_serializer_context()
+            timings = {}
+            for name, build in (
+                    ('DRF', lambda: serializer_class(
+                        page, many=True, context=context).data),
+                    ('Представление', lambda: view.representation(
+                        page, view.request))):
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    content = renderer.render(build())
+                timings[name] = (
+                    time.perf_counter() - started) / options['repeat']
+                if name == 'DRF':
+                    expected = content
+                elif content != expected:
+                    raise CommandError(f'{title}: ответы расходятся')
+            self.report(title, len(page), timings)
+
+    @staticmethod
+    def get_user(user_id):
+        users = User.objects.all()
+        if user_id is None:
+            users = users.annotate(
+                subscriptions=Count('subscriber')).order_by('-subscriptions')
+        else:
+            users = users.filter(pk=user_id)
+        user = users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден')
+        return user
+
+    @staticmethod
+    def make_view(view_class, path, user):
+        """Представление списка с запросом от имени user"""
+        request = Request(APIRequestFactory().get(path))
+        request.user = user
+        return view_class(
+            request=request, args=(), kwargs={}, format_kwarg=None,
+            action='list')
+
+    def report(self, title, count, timings):
+        drf, fast = timings['DRF'], timings['Представление']
+        self.stdout.write(
+            f'{title} ({count} на странице): '
+            f'DRF {drf * 1000:.2f} мс, {1 / drf:.0f} стр./с; '
+            f'представление {fast * 1000:.2f} мс, {1 / fast:.0f} стр./с'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{title}: быстрее в {drf / fast:.1f} раз'))
@@ -1,4 +1,24 @@
+import base64
+import binascii
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .counts import count_objects
+
+
+class KnownCountPaginator(Paginator):
+    """Пагинатор Django с заранее известным числом объектов"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
 
 
 class PageLimitPagination(PageNumberPagination):
@@ -6,3 +26,124 @@ class PageLimitPagination(PageNumberPagination):
 
     page_size_query_param = 'limit'
     page_size = 6
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Число объектов считается выбранной стратегией, см. counts"""
+        count, self.count_strategy = count_objects(queryset, request, view)
+        self.django_paginator_class = partial(KnownCountPaginator, count=count)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_strategy'] = self.count_strategy
+        return response
+
+
+class KeysetPagination(PageLimitPagination):
+    """
+    Пагинатор с курсором по ключу сортировки.
+
+    Включается параметром cursor (пустой - первая страница). Страница
+    выбирается условием по последнему ключу предыдущей страницы, а не
+    смещением, поэтому глубокие страницы стоят столько же, сколько
+    первая, и COUNT(*) не выполняется. Ключ - пара полей из
+    view.cursor_ordering, например ('-pub_date', '-id'). Без cursor
+    работает обычная постраничная навигация.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(request):
+            self.cursor_mode = False
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_mode = True
+        self.request = request
+        self.ordering = self.get_cursor_ordering(queryset, view)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.model = queryset.model
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param, ''))
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def use_cursor(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_cursor_ordering(self, queryset, view):
+        return view.cursor_ordering
+
+    def after(self, position):
+        """
+        Условие "строго после позиции" для составного ключа. Лишняя
+        на вид граница по первому полю дает индексу точку старта:
+        без нее OR читает индекс с начала и отбрасывает строки.
+        """
+        (first, second), (first_value, second_value) = self.ordering, position
+        first_lookup = 'lt' if first.startswith('-') else 'gt'
+        second_lookup = 'lt' if second.startswith('-') else 'gt'
+        first, second = self.fields
+        return Q(**{f'{first}__{first_lookup}e': first_value}) & (
+            Q(**{f'{first}__{first_lookup}': first_value})
+            | Q(**{first: first_value, f'{second}__{second_lookup}':
+                   second_value})
+        )
+
+    def encode_cursor(self, instance):
+        position = '|'.join(
+            self.model._meta.get_field(field).value_to_string(instance)
+            for field in self.fields)
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            values = base64.urlsafe_b64decode(
+                cursor.encode()).decode().split('|')
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                self.model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (binascii.Error, UnicodeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Лента листается только курсором, а ключом служит сортировка
+    самого запроса: записи ленты или рецепты, см. recipes.feed.
+    """
+
+    def use_cursor(self, request):
+        return True
+
+    def get_cursor_ordering(self, queryset, view):
+        return queryset.query.order_by
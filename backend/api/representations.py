@@ -0,0 +1,169 @@
+from operator import attrgetter
+
+from django.core.files.storage import default_storage
+
+from .serializers import (CustomUserSerializer, RecipeSerializer,
+                          RecipesShortSerializer, SubscriptionsSerializer,
+                          TagSerializer)
+
+
+class Urls:
+    """
+    Ссылки на файлы хранилища в том же виде, что у ImageField и
+    ImageVariantsField: абсолютные при наличии request, иначе
+    относительные. Ссылки кешируются на время одного ответа -
+    аватар автора повторяется во многих рецептах страницы.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.cache = {}
+        self._relative = None
+
+    @property
+    def relative(self):
+        """Ссылки того же ответа без request"""
+        if self.request is None:
+            return self
+        if self._relative is None:
+            self._relative = Urls()
+        return self._relative
+
+    def url(self, name):
+        url = self.cache.get(name)
+        if url is None:
+            url = default_storage.url(name)
+            if self.request is not None:
+                url = self.request.build_absolute_uri(url)
+            self.cache[name] = url
+        return url
+
+    def file(self, value):
+        if not value:
+            return None
+        return self.url(value.name)
+
+    def variants(self, value):
+        return {
+            size: {
+                extension: self.url(name)
+                for extension, name in files.items()
+            }
+            for size, files in value.items()
+        }
+
+
+class Representation:
+    """
+    Представление списка объектов без полей DRF: ключи и функции
+    доступа к значениям собираются один раз при импорте, а каждый
+    объект обходится одним проходом. Результат совпадает с
+    serializer_class(objects, many=True).data, это проверяют тесты.
+    """
+
+    def __init__(self, serializer_class, fields):
+        self.serializer_class = serializer_class
+        self.fields = tuple(fields)
+
+    def represent(self, obj, urls):
+        return {key: getter(obj, urls) for key, getter in self.fields}
+
+    def __call__(self, objects, request):
+        urls = Urls(request)
+        return [self.represent(obj, urls) for obj in objects]
+
+
+def value(source):
+    get = attrgetter(source)
+    return lambda obj, urls: get(obj)
+
+
+def image(source):
+    get = attrgetter(source)
+    return lambda obj, urls: urls.file(get(obj))
+
+
+def image_variants(source):
+    get = attrgetter(source)
+    return lambda obj, urls: urls.variants(get(obj))
+
+
+def constant(result):
+    return lambda obj, urls: result
+
+
+def nested_list(representation, source, relative=False):
+    """
+    Вложенный список. relative=True - ссылки без request, как у
+    сериализатора, созданного без контекста.
+    """
+    get = attrgetter(source)
+
+    def getter(obj, urls):
+        if relative:
+            urls = urls.relative
+        items = get(obj)
+        if not isinstance(items, list):
+            items = items.all()
+        return [representation.represent(item, urls) for item in items]
+    return getter
+
+
+def fields(*names):
+    return tuple((name, value(name)) for name in names)
+
+
+USER = Representation(CustomUserSerializer, (
+    *fields('id', 'username', 'email', 'first_name', 'last_name'),
+    ('avatar', image('avatar')),
+    ('avatar_variants', image_variants('avatar_variants')),
+    *fields('is_subscribed', 'recipes_count', 'followers_count'),
+))
+
+TAG = Representation(TagSerializer, fields('id', 'name', 'slug'))
+
+INGREDIENT_IN_RECIPE = Representation(None, (
+    ('id', value('ingredient.id')),
+    ('name', value('ingredient.name')),
+    ('measurement_unit', value('ingredient.measurement_unit')),
+    ('amount', value('amount')),
+))
+
+
+def recipe_author(recipe, urls):
+    author = recipe.author
+    author.is_subscribed = recipe.author_is_subscribed
+    return USER.represent(author, urls)
+
+
+RECIPE = Representation(RecipeSerializer, (
+    ('id', value('id')),
+    ('author', recipe_author),
+    ('name', value('name')),
+    ('image', image('image')),
+    ('image_variants', image_variants('image_variants')),
+    ('text', value('text')),
+    ('ingredients', nested_list(INGREDIENT_IN_RECIPE, 'recipe_list')),
+    ('tags', nested_list(TAG, 'tags')),
+    *fields('cooking_time', 'is_favorited', 'is_in_shopping_cart',
+            'favorites_count', 'in_carts_count'),
+))
+
+SHORT_RECIPE = Representation(RecipesShortSerializer, (
+    *fields('id', 'name'),
+    ('image', image('image')),
+    ('image_variants', image_variants('image_variants')),
+    ('cooking_time', value('cooking_time')),
+))
+
+SUBSCRIPTION = Representation(SubscriptionsSerializer, (
+    *((name, value(f'author.{name}')) for name in (
+        'email', 'id', 'username', 'first_name', 'last_name')),
+    ('avatar', image('author.avatar')),
+    ('avatar_variants', image_variants('author.avatar_variants')),
+    ('is_subscribed', constant(True)),
+    ('recipes', nested_list(
+        SHORT_RECIPE, 'author.limited_recipes', relative=True)),
+    ('recipes_count', value('author.recipes_count')),
+    ('followers_count', value('author.followers_count')),
+))
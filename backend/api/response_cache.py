@@ -0,0 +1,102 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from recipes.versions import get_versions
+from rest_framework.response import Response
+
+CACHE_ALIAS = 'responses'
+CACHED_PARAMS = ('page', 'limit', 'tags', 'author', 'cursor')
+STATS_KEYS = {'hits': 'response-cache:hits', 'misses': 'response-cache:misses'}
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def normalized_query(request):
+    """
+    Параметры запроса в каноническом виде или None, если в запросе
+    есть параметры, ответы на которые не кешируются.
+    """
+    params = request.query_params
+    if set(params) - set(CACHED_PARAMS):
+        return None
+    return (
+        params.get('page', '1'),
+        params.get('limit', ''),
+        tuple(sorted(set(params.getlist('tags')))),
+        params.get('author', ''),
+        params.get('cursor'),
+    )
+
+
+def cache_key(request, scopes):
+    """
+    Ключ ответа: адрес, нормализованные параметры и версии данных.
+    Сигналы меняют версию, и старые ответы просто перестают читаться.
+    """
+    query = normalized_query(request)
+    if query is None:
+        return None
+    digest = hashlib.md5(
+        f'{request.get_host()}|{request.path}|{query}|'
+        f'{get_versions(*scopes)}'.encode()
+    ).hexdigest()
+    return f'response-cache:{digest}'
+
+
+def count(outcome):
+    cache = get_cache()
+    key = STATS_KEYS[outcome]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_stats():
+    """Число попаданий и промахов кеша ответов и доля попаданий"""
+    stats = get_cache().get_many(STATS_KEYS.values())
+    hits = stats.get(STATS_KEYS['hits'], 0)
+    misses = stats.get(STATS_KEYS['misses'], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many(STATS_KEYS.values())
+
+
+def cache_anonymous_response(view_method):
+    """
+    Кеширует данные ответа представления для анонимных
+    пользователей. Заголовок X-Cache показывает HIT или MISS.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = None
+        if not request.user.is_authenticated:
+            key = cache_key(request, self.version_scopes)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        data = get_cache().get(key)
+        if data is not None:
+            count('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        count('misses')
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            get_cache().set(
+                key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
@@ -1,7 +1,11 @@
-from api.fields import Base64ImageField
+from api.fields import Base64ImageField, ImageVariantsField
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer
+from jobs.queue import enqueue
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Link,
                             Recipe, ShoppingCart, Tag)
+from recipes.similar import refresh_similar_recipes
 from rest_framework import serializers
 from users.models import Subscription, User
 
@@ -48,6 +52,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
 class CustomUserSerializer(UserSerializer):
     """Сериализатор для Пользователя"""
     avatar = Base64ImageField(allow_null=True, required=False)
+    avatar_variants = ImageVariantsField()
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -59,11 +64,16 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_variants',
             'is_subscribed',
+            'recipes_count',
+            'followers_count',
         )
 
     def get_is_subscribed(self, obj):
         """Метод проверки подписки"""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_authenticated:
             if isinstance(obj, User):
@@ -129,18 +139,28 @@ class RecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientRecipeSerializer(
         many=True, source='recipe_list')
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     author = CustomUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'author', 'name', 'image', 'text',
+        fields = ('id', 'author', 'name', 'image', 'image_variants', 'text',
                   'ingredients', 'tags', 'cooking_time',
-                  'is_favorited', 'is_in_shopping_cart')
+                  'is_favorited', 'is_in_shopping_cart',
+                  'favorites_count', 'in_carts_count')
+
+    def to_representation(self, instance):
+        """Передаем автору флаг подписки, посчитанный в queryset"""
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
         """Метод проверки на добавление в избранное."""
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -150,6 +170,8 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         """Метод проверки на присутствие в корзине."""
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -187,47 +209,46 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Теги должны быть уникальными')
 
-        ingredients = self.initial_data.get('ingredients')
+        ingredients = data.get('ingredients')
         if not ingredients:
             raise serializers.ValidationError({
                 'ingredients':
                 'Должен быть хотя бы один ингредиент'})
 
-        ingredient_list = []
-        for item in ingredients:
-            try:
-                ingredient = Ingredient.objects.get(pk=item['id'])
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(
-                    'Введен не существующий ингредиент')
-            if ingredient in ingredient_list:
-                raise serializers.ValidationError(
-                    'Ингридиенты должны быть уникальными')
-            ingredient_list.append(ingredient)
-            if int(item['amount']) < 1:
-                raise serializers.ValidationError({
-                    'ingredients':
-                    ('Значение ингредиента должно быть больше 0')})
-        data['ingredients'] = ingredients
+        ingredient_ids = {item['id'] for item in ingredients}
+        if len(ingredient_ids) != len(ingredients):
+            raise serializers.ValidationError(
+                'Ингридиенты должны быть уникальными')
+        if len(Ingredient.objects.in_bulk(ingredient_ids)) != len(
+                ingredient_ids):
+            raise serializers.ValidationError(
+                'Введен не существующий ингредиент')
         return data
 
     def create_ingredients(self, ingredients, recipe):
-        """Метод создания ингредиента"""
-
-        for element in ingredients:
-            id = element['id']
-            ingredient = Ingredient.objects.get(pk=id)
-            amount = element['amount']
-            IngredientInRecipe.objects.create(
-                ingredient=ingredient, recipe=recipe,
-                amount=amount
+        """Метод создания ингредиентов одним запросом"""
+
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=item['id'],
+                amount=item['amount']
             )
+            for item in ingredients
+        )
+
+    def update_ingredients(self, ingredients, recipe):
+        """Метод замены ингредиентов: меняются только отличающиеся строки"""
+
+        IngredientInRecipe.objects.set_amounts(
+            recipe, {item['id']: item['amount'] for item in ingredients})
 
     def create_tags(self, tags, recipe):
         """Метод добавления тега"""
 
         recipe.tags.set(tags)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Метод создания модели"""
 
@@ -238,18 +259,29 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data, author=user)
         self.create_ingredients(ingredients, recipe)
         self.create_tags(tags, recipe)
+        enqueue(refresh_similar_recipes, recipe.pk)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Метод обновления модели"""
 
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        self.create_ingredients(validated_data.pop('ingredients'), instance)
+        self.update_ingredients(validated_data.pop('ingredients'), instance)
+        enqueue(refresh_similar_recipes, instance.pk)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         """Метод представления модели"""
 
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'recipe_list',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient')
+            )
+        )
         serializer = RecipeSerializer(
             instance,
             context={
@@ -267,7 +299,8 @@ class ShortLinkSerialiser(serializers.ModelSerializer):
         fields = ('short_link',)
 
     def to_representation(self, instance):
-        return {'short-link': instance.short_link}
+        return {'short-link': self.context['request'].build_absolute_uri(
+            f'/s/{instance.short_link}/')}
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
@@ -285,12 +318,14 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
 
 class RecipesShortSerializer(serializers.ModelSerializer):
     """Сериализатор рецептов короткий."""
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = ('id',
                   'name',
                   'image',
+                  'image_variants',
                   'cooking_time',)
 
 
@@ -358,9 +393,11 @@ class SubscriptionsSerializer(CustomUserSerializer):
     first_name = serializers.ReadOnlyField(source="author.first_name")
     last_name = serializers.ReadOnlyField(source="author.last_name")
     avatar = serializers.ImageField(source='author.avatar')
+    avatar_variants = ImageVariantsField(source='author.avatar_variants')
     recipes = serializers.SerializerMethodField(method_name='get_recipes')
-    recipes_count = serializers.SerializerMethodField(
-        method_name='get_recipes_count')
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
+    followers_count = serializers.ReadOnlyField(
+        source='author.followers_count')
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed')
 
@@ -368,31 +405,27 @@ class SubscriptionsSerializer(CustomUserSerializer):
         model = User
         fields = ('email', 'id',
                   'username', 'first_name',
-                  'last_name', 'avatar',
+                  'last_name', 'avatar', 'avatar_variants',
                   'is_subscribed', 'recipes',
-                  'recipes_count'
+                  'recipes_count', 'followers_count'
                   )
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        if request.GET.get('recipes_limit'):
-            recipe_limit = int(request.GET.get('recipes_limit'))
-            queryset = Recipe.objects.filter(author=obj.author)[:recipe_limit]
+        if hasattr(obj.author, 'limited_recipes'):
+            queryset = obj.author.limited_recipes
         else:
+            request = self.context.get('request')
             queryset = Recipe.objects.filter(author=obj.author)
+            if request.GET.get('recipes_limit'):
+                recipe_limit = int(request.GET.get('recipes_limit'))
+                queryset = queryset[:recipe_limit]
         serializer = RecipesShortSerializer(
             queryset, many=True, read_only=True)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        """Количество рецептов автора."""
-        return Recipe.objects.filter(author=obj.author).count()
-
     def get_is_subscribed(self, obj):
-        """Метод проверки подписки"""
-        request = self.context.get('request')
-        return Subscription.objects.filter(
-            author=obj.author, user=request.user).exists()
+        """Сериализуемая подписка всегда принадлежит текущему юзеру"""
+        return True
 
 
 class SubscribedSerislizer(serializers.ModelSerializer):
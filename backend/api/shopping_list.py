@@ -0,0 +1,234 @@
+import csv
+import zlib
+from functools import lru_cache
+from io import BytesIO
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+from fontTools.subset import Options as SubsetOptions
+from fontTools.subset import Subsetter
+from fontTools.ttLib import TTFont
+from recipes.models import ShoppingListItem
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+PDF_MARGIN = 40
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 18
+PDF_LINES_PER_PAGE = (PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LINE_HEIGHT
+CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+
+
+def shopping_list_rows(user):
+    """Суммарное количество ингредиентов в корзине по алфавиту"""
+    return ShoppingListItem.objects.filter(user=user).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        sum=F('amount')
+    ).order_by('ingredient__name').iterator()
+
+
+def format_line(row):
+    return (
+        f"{row['ingredient__name']}  - "
+        f"{row['sum']}"
+        f"({row['ingredient__measurement_unit']})"
+    )
+
+
+def txt_stream(rows):
+    for row in rows:
+        yield format_line(row) + '\n'
+
+
+class Echo:
+    """Псевдобуфер: csv.writer сразу отдает записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow((
+            row['ingredient__name'],
+            row['sum'],
+            row['ingredient__measurement_unit']
+        ))
+
+
+@lru_cache(maxsize=None)
+def font_metrics(path):
+    """
+    Глифы и ширины TrueType-шрифта в единицах PDF (1/1000 кегля):
+    словарь код символа -> номер глифа, ширины глифов, PostScript-имя
+    и поля описания шрифта.
+    """
+    font = TTFont(path, lazy=True)
+    scale = 1000 / font['head'].unitsPerEm
+    glyphs = {
+        code: font.getGlyphID(name)
+        for code, name in font.getBestCmap().items()
+    }
+    widths = [
+        round(font['hmtx'][name][0] * scale)
+        for name in font.getGlyphOrder()
+    ]
+    head, hhea = font['head'], font['hhea']
+    bbox = ' '.join(
+        str(round(value * scale))
+        for value in (head.xMin, head.yMin, head.xMax, head.yMax))
+    ascent = round(hhea.ascent * scale)
+    cap_height = getattr(font.get('OS/2'), 'sCapHeight', 0)
+    descriptor = {
+        'Flags': 32,
+        'FontBBox': f'[{bbox}]',
+        'ItalicAngle': 0,
+        'Ascent': ascent,
+        'Descent': round(hhea.descent * scale),
+        'CapHeight': round(cap_height * scale) or ascent,
+        'StemV': 80,
+    }
+    return glyphs, widths, font['name'].getDebugName(6), descriptor
+
+
+def font_subset(path, glyph_ids):
+    """Шрифт только с использованными глифами, номера глифов прежние"""
+    options = SubsetOptions()
+    options.retain_gids = True
+    options.notdef_outline = True
+    # Отметка времени FontForge: в PDF не нужна, а без этого
+    # fontTools предупреждает, что не умеет ее урезать.
+    options.drop_tables.append('FFTM')
+    subsetter = Subsetter(options)
+    subsetter.populate(gids=glyph_ids)
+    font = TTFont(path)
+    subsetter.subset(font)
+    buffer = BytesIO()
+    font.save(buffer)
+    return buffer.getvalue()
+
+
+def to_unicode_cmap(characters):
+    """CMap для копирования и поиска текста: глиф -> символ"""
+    lines = [
+        '/CIDInit /ProcSet findresource begin 12 dict begin begincmap',
+        '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) '
+        '/Supplement 0 >> def',
+        '/CMapName /Adobe-Identity-UCS def /CMapType 2 def',
+        '1 begincodespacerange <0000> <FFFF> endcodespacerange',
+    ]
+    items = sorted(characters.items())
+    for start in range(0, len(items), 100):
+        chunk = items[start:start + 100]
+        lines.append(f'{len(chunk)} beginbfchar')
+        lines += [
+            f"<{glyph:04X}> <{char.encode('utf-16-be').hex().upper()}>"
+            for glyph, char in chunk
+        ]
+        lines.append('endbfchar')
+    lines.append('endcmap CMapName currentdict /CMap defineresource pop '
+                 'end end')
+    return '\n'.join(lines).encode()
+
+
+def pdf_stream(rows):
+    """
+    PDF с текстом, который пишется постранично: в памяти одновременно
+    находится только текущая страница. Текст набирается шрифтом
+    SHOPPING_LIST_FONT; шрифт с использованными глифами и дерево
+    страниц пишутся последними, когда известны все страницы.
+    """
+    path = settings.SHOPPING_LIST_FONT
+    glyphs, widths, font_name, descriptor = font_metrics(path)
+    characters = {}
+    offsets = {}
+    position = 0
+    pages = []
+    lines = (format_line(row) for row in rows)
+
+    def encode(text):
+        codes = []
+        for char in text:
+            glyph = glyphs.get(ord(char), 0)
+            characters.setdefault(glyph, char)
+            codes.append(f'{glyph:04X}')
+        return ''.join(codes)
+
+    def write_object(number, body, stream=None):
+        nonlocal position
+        offsets[number] = position
+        chunk = f'{number} 0 obj\n'.encode() + body
+        if stream is not None:
+            chunk += b'\nstream\n' + stream + b'\nendstream'
+        chunk += b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position += len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    # 3-7: шрифт, его описание, файл и CMap пишутся в конце.
+    number = 8
+    page_lines = list(islice(lines, PDF_LINES_PER_PAGE))
+    while page_lines or not pages:
+        content = zlib.compress((
+            f'BT /F1 {PDF_FONT_SIZE} Tf {PDF_LINE_HEIGHT} TL '
+            f'{PDF_MARGIN} {PAGE_HEIGHT - PDF_MARGIN - PDF_FONT_SIZE} Td '
+            + ' '.join(f'<{encode(line)}> Tj T*' for line in page_lines)
+            + ' ET'
+        ).encode())
+        yield write_object(number, (
+            f'<< /Length {len(content)} /Filter /FlateDecode >>'
+        ).encode(), content)
+        yield write_object(number + 1, (
+            f'<< /Type /Page /Parent 2 0 R '
+            f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> '
+            f'/Contents {number} 0 R >>'
+        ).encode())
+        pages.append(number + 1)
+        number += 2
+        page_lines = list(islice(lines, PDF_LINES_PER_PAGE))
+    kids = ' '.join(f'{page} 0 R' for page in pages)
+    yield write_object(2, (
+        f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'
+    ).encode())
+    # Префикс имени обязателен для встроенного подмножества шрифта.
+    name = f'/FOODGR+{font_name}'
+    yield write_object(3, (
+        f'<< /Type /Font /Subtype /Type0 /BaseFont {name} '
+        f'/Encoding /Identity-H /DescendantFonts [4 0 R] '
+        f'/ToUnicode 7 0 R >>'
+    ).encode())
+    used = sorted(set(characters) | {0})
+    glyph_widths = ' '.join(f'{glyph} [{widths[glyph]}]' for glyph in used)
+    yield write_object(4, (
+        f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont {name} '
+        f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+        f'/Supplement 0 >> /FontDescriptor 5 0 R '
+        f'/CIDToGIDMap /Identity /W [{glyph_widths}] >>'
+    ).encode())
+    fields = ' '.join(f'/{key} {value}' for key, value in descriptor.items())
+    yield write_object(5, (
+        f'<< /Type /FontDescriptor /FontName {name} {fields} '
+        f'/FontFile2 6 0 R >>'
+    ).encode())
+    font_file = font_subset(path, used)
+    data = zlib.compress(font_file)
+    yield write_object(6, (
+        f'<< /Length {len(data)} /Length1 {len(font_file)} '
+        f'/Filter /FlateDecode >>'
+    ).encode(), data)
+    cmap = to_unicode_cmap(characters)
+    yield write_object(7, f'<< /Length {len(cmap)} >>'.encode(), cmap)
+    xref = [f'xref\n0 {number}\n', '0000000000 65535 f \n']
+    xref += [f'{offsets[obj]:010d} 00000 n \n' for obj in range(1, number)]
+    xref.append(
+        f'trailer\n<< /Size {number} /Root 1 0 R >>\n'
+        f'startxref\n{position}\n%%EOF\n'
+    )
+    yield ''.join(xref).encode()
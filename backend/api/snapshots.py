@@ -0,0 +1,126 @@
+import json
+import mmap
+import os
+import tempfile
+from threading import Lock
+
+from django.conf import settings
+from django.http import HttpResponse
+from recipes.models import Ingredient, Tag
+from recipes.versions import INGREDIENTS, TAGS, get_versions
+from rest_framework.renderers import JSONRenderer
+
+from .serializers import IngredientSerializer, TagSerializer
+
+
+class ReferenceSnapshot:
+    """
+    Справочник, заранее сериализованный в JSON и сохраненный в файл.
+
+    Файл отображается в память (mmap), поэтому все воркеры на хосте
+    читают одни и те же страницы. Первая строка файла - заголовок
+    с версией данных и смещениями списка и отдельных объектов.
+    Когда версия в кеше меняется, первый заметивший это воркер
+    пишет новый файл рядом и атомарно подменяет им старый.
+    """
+
+    def __init__(self, name, model, serializer_class, scope):
+        self.name = name
+        self.model = model
+        self.serializer_class = serializer_class
+        self.scope = scope
+        self._state = None
+        self._lock = Lock()
+
+    @property
+    def path(self):
+        return os.path.join(settings.SNAPSHOT_DIR, f'{self.name}.json')
+
+    def build(self, version):
+        """Сериализует таблицу и атомарно подменяет файл снимка"""
+        renderer = JSONRenderer()
+        items = self.serializer_class(
+            self.model.objects.all(), many=True).data
+        body = [renderer.render(items)]
+        offsets = {}
+        position = len(body[0])
+        for item in items:
+            chunk = renderer.render(item)
+            offsets[item['id']] = (position, position + len(chunk))
+            position += len(chunk)
+            body.append(chunk)
+        header = json.dumps({
+            'version': version,
+            'list': (0, len(body[0])),
+            'items': offsets,
+        }).encode() + b'\n'
+        os.makedirs(settings.SNAPSHOT_DIR, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=settings.SNAPSHOT_DIR)
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(header)
+            file.writelines(body)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, self.path)
+
+    def open(self):
+        """Отображает файл снимка в память, если он есть"""
+        try:
+            with open(self.path, 'rb') as file:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        end = data.find(b'\n')
+        header = json.loads(data[:end])
+        start = end + 1
+        items = {
+            int(pk): (start + first, start + last)
+            for pk, (first, last) in header['items'].items()
+        }
+        list_first, list_last = header['list']
+        return (header['version'], data,
+                (start + list_first, start + list_last), items)
+
+    def get_state(self):
+        """Снимок текущей версии: отображенный или построенный заново"""
+        version = get_versions(self.scope)[0]
+        state = self._state
+        if state is not None and state[0] == version:
+            return state
+        with self._lock:
+            state = self.open()
+            if state is None or state[0] != version:
+                self.build(version)
+                state = self.open()
+            self._state = state
+        return state
+
+    def clear(self):
+        """Удаляет снимок: следующий запрос построит его заново"""
+        self._state = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def response(data, bounds):
+        first, last = bounds
+        return HttpResponse(data[first:last], content_type='application/json')
+
+    def list_response(self):
+        _, data, bounds, _ = self.get_state()
+        return self.response(data, bounds)
+
+    def detail_response(self, pk):
+        """Ответ с объектом или None, если такого объекта нет"""
+        _, data, _, items = self.get_state()
+        try:
+            bounds = items[int(pk)]
+        except (KeyError, ValueError):
+            return None
+        return self.response(data, bounds)
+
+
+tag_snapshot = ReferenceSnapshot('tags', Tag, TagSerializer, TAGS)
+ingredient_snapshot = ReferenceSnapshot(
+    'ingredients', Ingredient, IngredientSerializer, INGREDIENTS)
@@ -0,0 +1,141 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Ingredient, IngredientInRecipe, ShoppingCart,
+                            ShoppingListItem)
+from users.models import User
+
+from .utils import TemporaryFilesMixin, create_dataset, create_user
+
+CHANGELISTS = (
+    '/admin/recipes/recipe/',
+    '/admin/recipes/recipe/?q=author0',
+    '/admin/recipes/favorite/',
+    '/admin/recipes/shoppingcart/',
+    '/admin/recipes/ingredientinrecipe/',
+    '/admin/recipes/link/',
+    '/admin/users/user/',
+    '/admin/users/subscription/',
+)
+
+
+class AdminScaleTest(TemporaryFilesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipes = create_dataset(cls.reader, authors=2)
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@foodgram.ru', password='pass',
+            first_name='admin', last_name='admin')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertShoppingListsConsistent(self):
+        output = StringIO()
+        call_command('rebuild_shopping_lists', verify=True, stdout=output)
+        self.assertIn('Списки покупок совпадают', output.getvalue())
+
+    def test_changelists_do_not_grow_with_rows(self):
+        before = {url: self.count_queries(url) for url in CHANGELISTS}
+        create_dataset(self.reader, authors=6, prefix='extra')
+        for url in CHANGELISTS:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), before[url])
+
+    def test_author_search_is_exact(self):
+        response = self.client.get('/admin/recipes/recipe/?q=author0')
+        self.assertEqual(
+            {recipe.author.username
+             for recipe in response.context['cl'].result_list},
+            {'author0'})
+
+    def test_recipe_page_with_inline(self):
+        recipe = self.recipes[0]
+        response = self.client.get(
+            f'/admin/recipes/recipe/{recipe.id}/change/')
+        self.assertContains(response, 'recipe_list-TOTAL_FORMS')
+        self.assertNotContains(response, '<option value="{}">'.format(
+            Ingredient.objects.last().id))
+        response = self.client.get(
+            '/admin/autocomplete/?app_label=recipes'
+            '&model_name=ingredientinrecipe&field_name=ingredient&term=ингр')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_inline_edit_updates_shopping_lists(self):
+        recipe = self.recipes[0]
+        items = list(IngredientInRecipe.objects.filter(recipe=recipe))
+        data = {
+            'name': recipe.name, 'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'author': recipe.author_id,
+            'tags': list(recipe.tags.values_list('id', flat=True)),
+            'recipe_list-TOTAL_FORMS': len(items),
+            'recipe_list-INITIAL_FORMS': len(items),
+            'recipe_list-MIN_NUM_FORMS': 1,
+            'recipe_list-MAX_NUM_FORMS': 1000,
+        }
+        for number, item in enumerate(items):
+            data.update({
+                f'recipe_list-{number}-id': item.id,
+                f'recipe_list-{number}-recipe': recipe.id,
+                f'recipe_list-{number}-ingredient': item.ingredient_id,
+                f'recipe_list-{number}-amount': item.amount + 10,
+            })
+        data['recipe_list-0-DELETE'] = 'on'
+        response = self.client.post(
+            f'/admin/recipes/recipe/{recipe.id}/change/', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertShoppingListsConsistent()
+        response = self.client.post(
+            f'/admin/recipes/recipe/{recipe.id}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertShoppingListsConsistent()
+
+    def test_ingredient_rows_update_shopping_lists(self):
+        row = IngredientInRecipe.objects.filter(
+            recipe=self.recipes[0]).first()
+        response = self.client.post(
+            f'/admin/recipes/ingredientinrecipe/{row.id}/change/', {
+                'recipe': self.recipes[2].id,
+                'ingredient': Ingredient.objects.last().id,
+                'amount': row.amount + 5})
+        self.assertEqual(response.status_code, 302)
+        self.assertShoppingListsConsistent()
+        response = self.client.post(
+            f'/admin/recipes/ingredientinrecipe/{row.id}/delete/',
+            {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertShoppingListsConsistent()
+
+    def test_cart_changes_update_shopping_lists(self):
+        response = self.client.post('/admin/recipes/shoppingcart/add/', {
+            'user': self.reader.id, 'recipe': self.recipes[1].id})
+        self.assertEqual(response.status_code, 302)
+        self.assertShoppingListsConsistent()
+        cart = ShoppingCart.objects.get(
+            user=self.reader, recipe=self.recipes[1])
+        response = self.client.post(
+            f'/admin/recipes/shoppingcart/{cart.id}/change/', {
+                'user': self.admin.id, 'recipe': self.recipes[3].id})
+        self.assertEqual(response.status_code, 302)
+        cart.refresh_from_db()
+        self.assertEqual(
+            (cart.user, cart.recipe), (self.reader, self.recipes[1]))
+        response = self.client.post('/admin/recipes/shoppingcart/', {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': list(ShoppingCart.objects.values_list(
+                'id', flat=True))})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ShoppingListItem.objects.exists())
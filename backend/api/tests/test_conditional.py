@@ -0,0 +1,82 @@
+from api.snapshots import tag_snapshot
+from django.test import TestCase, override_settings
+from recipes.models import Favorite, Tag
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .utils import create_dataset, create_user
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipes = create_dataset(cls.reader, authors=2)
+
+    def setUp(self):
+        tag_snapshot.clear()
+        self.anon_client = APIClient()
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+
+    def assertNotModified(self, client, url, **headers):
+        with self.assertNumQueries(0):
+            response = client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_not_modified_without_queries(self):
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipes[0].id}/',
+                    '/api/tags/', '/api/ingredients/?name=и'):
+            for client in (self.anon_client, self.reader_client):
+                with self.subTest(url=url, client=client):
+                    response = client.get(url)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertNotModified(
+                        client, url, HTTP_IF_NONE_MATCH=response['ETag'])
+                    self.assertNotModified(
+                        client, url,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+    def test_etag_depends_on_query_and_user(self):
+        first = self.anon_client.get('/api/recipes/?limit=1')['ETag']
+        self.assertNotEqual(
+            first, self.anon_client.get('/api/recipes/?limit=2')['ETag'])
+        self.assertNotEqual(
+            first, self.reader_client.get('/api/recipes/?limit=1')['ETag'])
+
+    @override_settings(COUNTERS_VERSION_INTERVAL=0)
+    def test_counter_change_invalidates_everyone(self):
+        """Избранное меняет favorites_count, видимый всем читателям"""
+        recipe = self.recipes[1]
+        urls = ('/api/recipes/', f'/api/recipes/{recipe.id}/')
+        etags = {
+            (url, client): client.get(url)['ETag']
+            for url in urls
+            for client in (self.anon_client, self.reader_client)
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(
+                user=create_user('other'), recipe=recipe)
+        for (url, client), etag in etags.items():
+            with self.subTest(url=url, client=client):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.anon_client.get(urls[1])
+        self.assertEqual(
+            response.json()['favorites_count'], recipe.favorites_count + 1)
+
+    def test_data_change_invalidates(self):
+        etag = self.anon_client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Десерт', slug='dessert')
+        response = self.anon_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 4)
+
+    def test_cache_control(self):
+        response = self.anon_client.get('/api/recipes/')
+        self.assertIn('public', response['Cache-Control'])
+        response = self.reader_client.get('/api/recipes/')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
@@ -0,0 +1,159 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.test import TestCase
+from recipes.cookable import cookable_sql, find_cookable
+from recipes.indexes import recipe_ingredient_index
+from recipes.models import (CompositionChange, Ingredient, IngredientInRecipe,
+                            Recipe)
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .utils import create_user
+
+URL = '/api/recipes/cookable/'
+COMPOSITIONS = {
+    'Омлет': ('яйцо', 'молоко'),
+    'Блины': ('яйцо', 'молоко', 'мука'),
+    'Пирог': ('яйцо', 'мука', 'сахар', 'масло'),
+    'Салат': ('огурец', 'помидор'),
+}
+
+
+class CookableTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.ingredients = {}
+        for names in COMPOSITIONS.values():
+            for name in names:
+                if name not in cls.ingredients:
+                    cls.ingredients[name] = Ingredient.objects.create(
+                        name=name, measurement_unit='г')
+        cls.recipes = {}
+        for name, ingredients in COMPOSITIONS.items():
+            recipe = Recipe.objects.create(
+                author=author, name=name, text=name,
+                image='recipes/images/recipe.png', cooking_time=10)
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=cls.ingredients[ingredient],
+                    amount=1)
+                for ingredient in ingredients)
+            cls.recipes[name] = recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        recipe_ingredient_index.build()
+
+    def ids(self, *names):
+        return {self.ingredients[name].id for name in names}
+
+    def search(self, *names, missing=0):
+        response = self.client.get(URL, {
+            'ingredients': ','.join(map(str, self.ids(*names))),
+            'missing': missing})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['name'], item['missing'])
+                for item in response.data['results']]
+
+    def test_ranked_by_coverage(self):
+        self.assertEqual(self.search('яйцо', 'молоко'), [('Омлет', 0)])
+        self.assertEqual(
+            self.search('яйцо', 'молоко', missing=1),
+            [('Омлет', 0), ('Блины', 1)])
+        self.assertEqual(
+            self.search('яйцо', 'мука', 'сахар', missing=2),
+            [('Пирог', 1), ('Блины', 1), ('Омлет', 1)])
+        self.assertEqual(self.search('огурец'), [])
+
+    def test_index_matches_sql(self):
+        for names in (('яйцо',), ('яйцо', 'мука', 'огурец'),
+                      ('молоко', 'масло', 'помидор')):
+            for missing in range(4):
+                self.assertEqual(
+                    find_cookable(self.ids(*names), missing),
+                    cookable_sql(self.ids(*names), missing))
+
+    def test_sql_fallback_while_index_is_cold(self):
+        recipe_ingredient_index.invalidate()
+        self.assertEqual(
+            self.search('яйцо', 'молоко', missing=1),
+            [('Омлет', 0), ('Блины', 1)])
+
+    def test_incremental_update(self):
+        salad = self.recipes['Салат']
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientInRecipe.objects.create(
+                recipe=salad, ingredient=self.ingredients['яйцо'], amount=1)
+            self.recipes['Омлет'].delete()
+        # Версия, журнал с момента построения и составы рецептов.
+        with self.assertNumQueries(3):
+            self.assertEqual(
+                recipe_ingredient_index.search(self.ids('яйцо', 'молоко'), 1),
+                [(self.recipes['Блины'].id, 1)])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                recipe_ingredient_index.search(
+                    self.ids('яйцо', 'огурец', 'помидор'), 0),
+                [(salad.id, 0)])
+        self.assertEqual(
+            find_cookable(self.ids('яйцо', 'огурец'), 1),
+            cookable_sql(self.ids('яйцо', 'огурец'), 1))
+
+    def test_one_change_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ('Пирог', 'Салат'):
+                IngredientInRecipe.objects.filter(
+                    recipe=self.recipes[name]).delete()
+                IngredientInRecipe.objects.bulk_create(
+                    IngredientInRecipe(
+                        recipe=self.recipes[name], ingredient=ingredient,
+                        amount=1)
+                    for ingredient in self.ingredients.values())
+                for row in self.recipes[name].recipe_list.all():
+                    row.save()
+        self.assertEqual(
+            list(CompositionChange.objects.values_list(
+                'recipe_ids', flat=True))[-1:],
+            [sorted(self.recipes[name].id for name in ('Пирог', 'Салат'))])
+        self.assertEqual(
+            recipe_ingredient_index.search(self.ids('огурец'), 6),
+            [(self.recipes['Салат'].id, 6), (self.recipes['Пирог'].id, 6)])
+
+    def test_change_after_rolled_back_savepoint(self):
+        salad = self.recipes['Салат']
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    salad.recipe_list.first().save()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+            salad.recipe_list.first().save()
+        self.assertIn(
+            salad.id,
+            CompositionChange.objects.order_by('id').last().recipe_ids)
+
+    def test_gap_in_change_log_rebuilds(self):
+        recipe_ingredient_index.changed([self.recipes['Салат'].id])
+        recipe_ingredient_index.changed([self.recipes['Пирог'].id])
+        CompositionChange.objects.order_by('id').last().delete()
+        recipe_ingredient_index.changed([self.recipes['Омлет'].id])
+        self.assertIsNone(
+            recipe_ingredient_index.search(self.ids('яйцо'), 1))
+
+    def test_bad_params(self):
+        for params in ({'ingredients': 'egg'}, {'missing': '-1'}):
+            self.assertEqual(
+                self.client.get(URL, params).status_code,
+                status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(URL).data['results'], [])
+
+    def test_benchmark_command(self):
+        output = StringIO()
+        call_command('benchmark_cookable', queries=5, stdout=output)
+        self.assertIn('SQL', output.getvalue())
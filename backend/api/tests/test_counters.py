@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from recipes.models import Favorite, Recipe, ShoppingCart
+from rest_framework import status
+from rest_framework.test import APIClient
+from users.models import Subscription, User
+
+from .utils import create_dataset, create_user
+
+
+class CountersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipes = create_dataset(cls.reader, authors=2)
+        cls.recipe = cls.recipes[1]
+        cls.author = cls.recipe.author
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def assertCounters(self, recipe, favorites, carts):
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, favorites)
+        self.assertEqual(recipe.in_carts_count, carts)
+        self.assertCountersConsistent()
+
+    def reconcile(self, **options):
+        output = StringIO()
+        call_command('reconcile_counters', stdout=output, **options)
+        return output.getvalue()
+
+    def assertCountersConsistent(self):
+        self.assertIn(
+            'Счетчики совпадают с данными', self.reconcile(verify=True))
+
+    def test_initial_values(self):
+        self.assertCounters(self.recipes[0], 1, 1)
+        self.assertCounters(self.recipe, 0, 0)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 4)
+        self.assertEqual(self.author.followers_count, 1)
+
+    def test_favorite_and_cart(self):
+        for endpoint in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{self.recipe.id}/{endpoint}/'
+            self.assertEqual(
+                self.client.post(url).status_code, status.HTTP_201_CREATED)
+        self.assertCounters(self.recipe, 1, 1)
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.data['favorites_count'], 1)
+        self.assertEqual(response.data['in_carts_count'], 1)
+        for endpoint in ('favorite', 'shopping_cart'):
+            self.client.delete(f'/api/recipes/{self.recipe.id}/{endpoint}/')
+        self.assertCounters(self.recipe, 0, 0)
+
+    def test_subscribe_and_recipes(self):
+        follower = create_user('follower')
+        self.client.force_authenticate(follower)
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        response = self.client.get(f'/api/users/{self.author.id}/')
+        self.assertEqual(response.data['followers_count'], 2)
+        self.assertEqual(response.data['recipes_count'], 4)
+        self.recipe.delete()
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(response.data['results'][0]['recipes_count'], 3)
+        self.assertEqual(response.data['results'][0]['followers_count'], 2)
+        self.client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertCountersConsistent()
+
+    def test_cascade_delete(self):
+        User.objects.filter(id=self.reader.id).delete()
+        self.assertCounters(self.recipes[0], 0, 0)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+
+    def test_reconcile(self):
+        Recipe.objects.update(favorites_count=7)
+        User.objects.update(followers_count=0)
+        errors = StringIO()
+        with self.assertRaises(CommandError):
+            self.reconcile(verify=True, stderr=errors)
+        self.assertIn('favorites_count: сохранено 7', errors.getvalue())
+        self.assertIn(
+            'Пользователи, followers_count: исправлено 2', self.reconcile())
+        self.assertCountersConsistent()
+        self.assertEqual(
+            sum(Recipe.objects.values_list('favorites_count', flat=True)),
+            Favorite.objects.count())
+        self.assertEqual(
+            sum(Recipe.objects.values_list('in_carts_count', flat=True)),
+            ShoppingCart.objects.count())
+        self.assertEqual(
+            sum(User.objects.values_list('followers_count', flat=True)),
+            Subscription.objects.count())
@@ -0,0 +1,87 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from jobs.queue import INLINE, Worker
+from recipes.models import FeedEntry, Ingredient, Recipe, Tag
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .utils import create_dataset, create_recipes, create_user
+
+URL = '/api/recipes/feed/'
+
+
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipes = create_dataset(cls.reader, authors=3)
+        cls.stranger = create_user('stranger')
+        cls.tags = list(Tag.objects.all())
+        cls.ingredients = list(Ingredient.objects.all())
+        create_recipes(cls.stranger, 2, cls.tags, cls.ingredients)
+        Worker(INLINE).run(once=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def feed(self, limit=100):
+        ids, url = [], f'{URL}?limit={limit}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def expected(self, user):
+        return list(Recipe.objects.filter(
+            author__subscribed__user=user).values_list('id', flat=True))
+
+    def test_fan_out_on_create(self):
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(),
+            len(self.recipes))
+        self.assertEqual(self.feed(), self.expected(self.reader))
+
+    def test_keyset_pages(self):
+        self.assertEqual(self.feed(limit=5), self.expected(self.reader))
+        response = self.client.get(f'{URL}?cursor=broken')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_single_index_scan(self):
+        # Авторы без ленты, записи ленты, рецепты, теги, ингредиенты.
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'{URL}?limit=6')
+        self.assertEqual(len(queries), 5)
+        entries = queries.captured_queries[1]['sql']
+        self.assertIn('recipes_feedentry', entries)
+        self.assertNotIn('JOIN', entries)
+
+    def test_subscribe_backfills_and_unsubscribe_clears(self):
+        url = f'/api/users/{self.stranger.id}/subscribe/'
+        self.assertEqual(
+            self.client.post(url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.feed(), self.expected(self.reader))
+        self.assertEqual(
+            self.client.delete(url).status_code,
+            status.HTTP_204_NO_CONTENT)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.reader, recipe__author=self.stranger).exists())
+        self.assertEqual(self.feed(), self.expected(self.reader))
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_authors_are_pulled(self):
+        author = self.recipes[0].author
+        recipe = create_recipes(author, 1, self.tags, self.ingredients)[0]
+        Worker(INLINE).run(once=True)
+        self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+        self.assertEqual(self.feed(limit=4), self.expected(self.reader))
+        self.assertEqual(self.feed()[0], recipe.id)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(
+            self.client.get(URL).status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,73 @@
+from django.core.cache import caches
+from django.test import TestCase
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+from .utils import create_tags, create_user
+
+URL = '/api/recipes/'
+
+
+class FullTextSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.other = create_user('other')
+        cls.breakfast, cls.lunch, _ = create_tags()
+        cls.in_text = cls.create(
+            cls.author, 'Каша', 'Подать с борщом и сметаной', cls.breakfast)
+        cls.in_name = cls.create(
+            cls.author, 'Борщ украинский', 'Свекла и капуста', cls.lunch)
+        cls.other_author = cls.create(
+            cls.other, 'Борщ зеленый', 'Щавель', cls.lunch)
+        cls.create(cls.other, 'Омлет', 'Яйца и молоко', cls.breakfast)
+
+    @staticmethod
+    def create(author, name, text, tag):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text=text,
+            image='recipes/images/recipe.png', cooking_time=10)
+        recipe.tags.set([tag])
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['responses'].clear()
+
+    def search(self, **params):
+        return [item['id'] for item in self.client.get(
+            URL, params).data['results']]
+
+    def test_name_is_ranked_above_text(self):
+        self.assertEqual(
+            self.search(q='борщ')[-1], self.in_text.id)
+        self.assertCountEqual(
+            self.search(q='борщ'),
+            [self.in_name.id, self.other_author.id, self.in_text.id])
+
+    def test_all_words_and_prefixes(self):
+        self.assertEqual(self.search(q='борщ укр'), [self.in_name.id])
+        self.assertEqual(self.search(q='сметана щавель'), [])
+        self.assertEqual(self.search(q='ЯЙЦА'), [
+            Recipe.objects.get(name='Омлет').id])
+
+    def test_combines_with_filters(self):
+        self.assertEqual(
+            self.search(q='борщ', tags='breakfast'), [self.in_text.id])
+        self.assertEqual(
+            self.search(q='борщ', author=self.other.id),
+            [self.other_author.id])
+
+    def test_index_follows_changes(self):
+        self.in_name.name = 'Солянка'
+        self.in_name.text = 'Копчености'
+        self.in_name.save()
+        self.assertNotIn(self.in_name.id, self.search(q='борщ'))
+        self.assertEqual(self.search(q='солянка'), [self.in_name.id])
+        self.in_name.delete()
+        self.assertEqual(self.search(q='солянка'), [])
+
+    def test_operators_in_input_are_ignored(self):
+        self.assertEqual(self.search(q='"* OR NEAR('), [])
+        self.assertEqual(self.search(q='   '), self.search())
@@ -0,0 +1,169 @@
+import base64
+from io import BytesIO, StringIO
+
+from api.response_cache import get_cache
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase
+from jobs.models import Job
+from jobs.queue import INLINE, Worker
+from PIL import Image
+from recipes.images import WEBP_SUPPORTED, refresh_variants_job, variant_names
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.versions import RECIPES, get_versions
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .utils import TemporaryFilesMixin, create_dataset, create_user
+
+
+def image_data(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 100, 50)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class ImageVariantsTest(TemporaryFilesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('cook')
+        create_dataset(create_user('reader'), authors=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, width=1600, height=800, run_jobs=True):
+        response = self.client.post('/api/recipes/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': image_data(width, height),
+            'tags': [Tag.objects.first().id],
+            'ingredients': [
+                {'id': Ingredient.objects.first().id, 'amount': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        if run_jobs:
+            self.run_jobs()
+        return response
+
+    def run_jobs(self):
+        Worker(INLINE).run(once=True)
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+    def assertVariants(self, variants, width, height):
+        extensions = {'png', 'webp'} if WEBP_SUPPORTED else {'png'}
+        self.assertEqual(
+            sorted(variants), sorted(map(str, settings.IMAGE_VARIANT_SIZES)))
+        for size, files in variants.items():
+            self.assertEqual(set(files), extensions)
+            for name in files.values():
+                with default_storage.open(name) as file:
+                    image = Image.open(file)
+                    self.assertLessEqual(max(image.size), int(size))
+                    self.assertLessEqual(image.size, (width, height))
+
+    def test_variants_built_in_background(self):
+        response = self.create_recipe(run_jobs=False)
+        self.assertEqual(response.data['image_variants'], {})
+        job = Job.objects.get(name=refresh_variants_job.job_name)
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.args[:2], ['recipes.recipe', response.data['id']])
+        self.run_jobs()
+        self.assertVariants(
+            Recipe.objects.get(id=response.data['id']).image_variants,
+            1600, 800)
+
+    def test_variants_exposed(self):
+        recipe_id = self.create_recipe().data['id']
+        recipe = Recipe.objects.get(id=recipe_id)
+        self.assertVariants(recipe.image_variants, 1600, 800)
+        response = self.client.get(f'/api/recipes/{recipe_id}/')
+        url = response.data['image_variants']['480']['png']
+        self.assertTrue(url.startswith('http://testserver/media/'))
+        self.assertTrue(url.endswith('_480.png'))
+
+    def test_small_image_not_upscaled(self):
+        recipe = Recipe.objects.get(id=self.create_recipe(100, 50).data['id'])
+        self.assertVariants(recipe.image_variants, 100, 50)
+
+    def test_replaced_image_cleans_old_variants(self):
+        recipe_id = self.create_recipe().data['id']
+        old = Recipe.objects.get(id=recipe_id).image_variants['160']['png']
+        response = self.client.patch(
+            f'/api/recipes/{recipe_id}/', {
+                'image': image_data(300, 300),
+                'tags': [Tag.objects.first().id],
+                'ingredients': [
+                    {'id': Ingredient.objects.first().id, 'amount': 1}],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.run_jobs()
+        self.assertFalse(default_storage.exists(old))
+        self.assertVariants(
+            Recipe.objects.get(id=recipe_id).image_variants, 300, 300)
+
+    def test_deleted_recipe_and_user_clean_variants(self):
+        recipe_id = self.create_recipe().data['id']
+        names = variant_names(Recipe.objects.get(id=recipe_id).image_variants)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{recipe_id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.client.put(
+            '/api/users/me/avatar/', {'avatar': image_data(600, 600)},
+            format='json')
+        self.run_jobs()
+        self.user.refresh_from_db()
+        names |= variant_names(self.user.avatar_variants)
+        self.assertTrue(names)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        for name in names:
+            self.assertFalse(default_storage.exists(name), name)
+
+    def test_variants_refresh_cached_lists(self):
+        recipe_id = self.create_recipe(run_jobs=False).data['id']
+        anonymous = APIClient()
+        get_cache().clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            anonymous.get('/api/recipes/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_jobs()
+        response = anonymous.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        recipe, = (recipe for recipe in response.json()['results']
+                   if recipe['id'] == recipe_id)
+        self.assertTrue(recipe['image_variants'])
+
+        versions = get_versions(RECIPES)
+        Recipe.objects.filter(id=recipe_id).update(image_variants={})
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'generate_image_variants', processes=1, stdout=StringIO())
+        self.assertNotEqual(get_versions(RECIPES), versions)
+
+    def test_avatar_variants(self):
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': image_data(600, 600)},
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.run_jobs()
+        self.user.refresh_from_db()
+        self.assertVariants(self.user.avatar_variants, 600, 600)
+        response = self.client.get('/api/users/me/')
+        self.assertIn('160', response.data['avatar_variants'])
+
+    def test_command_rebuilds_missing(self):
+        recipe_id = self.create_recipe().data['id']
+        Recipe.objects.filter(id=recipe_id).update(image_variants={})
+        output = StringIO()
+        call_command('generate_image_variants', processes=2, stdout=output)
+        self.assertIn(
+            'Рецепты: обработано 5, копии построены для 1', output.getvalue())
+        self.assertVariants(
+            Recipe.objects.get(id=recipe_id).image_variants, 1600, 800)
+        # Рецепты из набора данных ссылаются на несуществующие файлы.
+        self.assertFalse(Recipe.objects.exclude(
+            id=recipe_id).exclude(image_variants={}).exists())
@@ -0,0 +1,69 @@
+from django.test import TestCase
+from recipes.indexes import ingredient_index, ingredient_trigram_index
+from recipes.models import Ingredient
+from rest_framework.test import APIClient
+
+URL = '/api/ingredients/'
+
+
+class IngredientPrefixSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Ёжевика', 'ежевичный джем', 'Едa', 'мёд',
+                     'Медь пищевая', 'молоко', 'яблоко'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        self.client = APIClient()
+        ingredient_index.build()
+
+    def search(self, name):
+        return [item['name'] for item in self.client.get(
+            URL, {'name': name}).data]
+
+    def test_case_and_yo_are_ignored(self):
+        self.assertEqual(self.search('ЕЖ'), ['Ёжевика', 'ежевичный джем'])
+        self.assertEqual(self.search('мед'), ['мёд', 'Медь пищевая'])
+        self.assertEqual(self.search('мё'), ['мёд', 'Медь пищевая'])
+
+    def test_results_are_sorted_by_name(self):
+        self.assertEqual(
+            self.search('м'), ['мёд', 'Медь пищевая', 'молоко'])
+        self.assertEqual(self.search('х'), [])
+
+    def test_index_rebuilds_after_change(self):
+        Ingredient.objects.create(name='молоко козье', measurement_unit='мл')
+        with self.assertNumQueries(2):
+            self.assertIn('молоко козье', self.search('мол'))
+        with self.assertNumQueries(0):
+            self.assertIn('молоко козье', self.search('мол'))
+
+
+class IngredientTrigramSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('молоко', 'молоко топленое', 'сгущенное молоко',
+                     'мука', 'малина'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        self.client = APIClient()
+        ingredient_trigram_index.build()
+
+    def search(self, query):
+        return [item['name'] for item in self.client.get(
+            URL, {'search': query}).data]
+
+    def test_prefix_matches_go_first(self):
+        self.assertEqual(
+            self.search('молоко'),
+            ['молоко', 'молоко топленое', 'сгущенное молоко'])
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.search('малоко')[0], 'молоко')
+        self.assertEqual(self.search('сгущеное'), ['сгущенное молоко'])
+
+    def test_no_matches(self):
+        self.assertEqual(self.search('шоколад'), [])
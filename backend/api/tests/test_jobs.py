@@ -0,0 +1,129 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import INLINE, THREAD, Worker, enqueue, job
+
+calls = []
+
+
+@job
+def record(value):
+    calls.append(value)
+
+
+@job(max_attempts=2)
+def fail(message):
+    raise RuntimeError(message)
+
+
+def not_a_job():
+    calls.append('unregistered')
+
+
+@override_settings(JOB_RETRY_DELAY=10)
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_and_records_timing(self):
+        enqueue(record, 1)
+        enqueue(record, value=2)
+        self.assertEqual(Worker(INLINE).run(once=True), 2)
+        self.assertEqual(sorted(calls), [1, 2])
+        for item in Job.objects.all():
+            self.assertEqual(item.status, Job.DONE)
+            self.assertEqual(item.attempts, 1)
+            self.assertIsNotNone(item.duration)
+            self.assertIsNotNone(item.finished_at)
+
+    def test_rolled_back_job_is_not_queued(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            enqueue(record, 1)
+            raise ValueError
+        self.assertFalse(Job.objects.exists())
+
+    def test_thread_pool(self):
+        for value in range(5):
+            enqueue(record, value)
+        self.assertEqual(Worker(THREAD, concurrency=2).run(once=True), 5)
+        self.assertEqual(sorted(calls), list(range(5)))
+
+    def test_retries_with_backoff(self):
+        item = enqueue(fail, 'сбой')
+        Worker(INLINE).run(once=True)
+        item.refresh_from_db()
+        self.assertEqual(item.status, Job.QUEUED)
+        self.assertIn('RuntimeError: сбой', item.last_error)
+        self.assertGreater(item.run_after, timezone.now())
+        # Задержка еще не прошла: задача не запускается.
+        self.assertEqual(Worker(INLINE).run(once=True), 0)
+        Job.objects.update(run_after=timezone.now())
+        Worker(INLINE).run(once=True)
+        item.refresh_from_db()
+        self.assertEqual(item.status, Job.FAILED)
+        self.assertEqual(item.attempts, 2)
+
+    def test_visibility_timeout(self):
+        item = enqueue(record, 1)
+        claimed = Job.objects.claim('crashed', 10)
+        self.assertEqual(claimed, [item])
+        self.assertEqual(Job.objects.claim('other', 10), [])
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Worker(INLINE).run(once=True), 1)
+        item.refresh_from_db()
+        self.assertEqual(item.status, Job.DONE)
+        self.assertEqual(item.attempts, 2)
+
+    def test_expired_after_last_attempt_fails(self):
+        item = enqueue(fail, 'сбой')
+        Job.objects.update(
+            status=Job.RUNNING, attempts=2,
+            locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Job.objects.claim('worker', 10), [])
+        item.refresh_from_db()
+        self.assertEqual(item.status, Job.FAILED)
+
+    def test_only_registered_functions(self):
+        Job.objects.create(name=f'{__name__}.not_a_job')
+        Worker(INLINE).run(once=True)
+        self.assertEqual(calls, [])
+        self.assertIn('не зарегистрирована', Job.objects.get().last_error)
+
+    @override_settings(JOB_DONE_RETENTION=60, JOB_FAILED_RETENTION=600)
+    def test_old_finished_jobs_pruned(self):
+        now = timezone.now()
+        kept = [
+            Job.objects.create(
+                name='a', status=Job.DONE,
+                finished_at=now - timedelta(seconds=30)),
+            Job.objects.create(
+                name='b', status=Job.FAILED,
+                finished_at=now - timedelta(seconds=300)),
+            Job.objects.create(name='c', status=Job.QUEUED),
+        ]
+        Job.objects.create(
+            name='d', status=Job.DONE,
+            finished_at=now - timedelta(seconds=120))
+        Job.objects.create(
+            name='e', status=Job.FAILED,
+            finished_at=now - timedelta(seconds=1200))
+        worker = Worker(INLINE)
+        worker.prune_if_due()
+        self.assertCountEqual(Job.objects.all(), kept)
+        Job.objects.filter(name='a').update(
+            finished_at=now - timedelta(seconds=120))
+        worker.prune_if_due()
+        self.assertEqual(Job.objects.count(), 3)
+
+    def test_command(self):
+        enqueue(record, 1)
+        output = StringIO()
+        call_command('run_jobs', once=True, pool=INLINE, stdout=output)
+        self.assertIn('Обработано задач: 1', output.getvalue())
+        self.assertEqual(calls, [1])
@@ -0,0 +1,139 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .utils import create_dataset, create_user
+
+
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipes = create_dataset(cls.reader, authors=3)
+        # Одинаковое время публикации: порядок решает id.
+        Recipe.objects.filter(id__in=[
+            recipe.id for recipe in cls.recipes[:4]
+        ]).update(pub_date=cls.recipes[0].pub_date)
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def walk(self, url):
+        """Проходит все страницы по ссылкам next"""
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_recipes_match_ordering(self):
+        self.assertEqual(
+            self.walk('/api/recipes/?cursor=&limit=5'),
+            list(Recipe.objects.values_list('id', flat=True)))
+
+    def test_filters_apply(self):
+        self.assertEqual(
+            self.walk('/api/recipes/?cursor=&limit=2&is_favorited=1'),
+            list(Recipe.objects.filter(
+                recipe_favorite__user=self.reader
+            ).values_list('id', flat=True)))
+
+    def test_subscriptions(self):
+        self.assertEqual(
+            self.walk('/api/users/subscriptions/?cursor=&limit=2'),
+            list(self.reader.subscriber.values_list('author', flat=True)))
+
+    def test_page_size_is_constant(self):
+        # Рецепты, теги и ингредиенты; COUNT(*) не выполняется.
+        url = '/api/recipes/?cursor=&limit=3'
+        for _ in range(3):
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            url = response.data['next']
+
+    def test_cursor_bounds_first_field(self):
+        response = self.client.get('/api/recipes/?cursor=&limit=3')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data['next'])
+        self.assertIn('"recipes_recipe"."pub_date" <=', queries[0]['sql'])
+
+    def test_offset_format_kept(self):
+        response = self.client.get('/api/recipes/?page=2&limit=5')
+        self.assertEqual(response.data['count'], len(self.recipes))
+        self.assertEqual(response.data['count_strategy'], 'exact')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_max_limit(self):
+        for url in ('/api/recipes/?limit=1000',
+                    '/api/recipes/?cursor=&limit=1000'):
+            with self.subTest(url=url):
+                with self.captureOnCommitCallbacks(execute=True):
+                    create_dataset(
+                        self.reader, authors=10, recipes_per_author=10,
+                        prefix=f'many{len(url)}')
+                response = self.client.get(url)
+                self.assertEqual(len(response.data['results']), 100)
+
+    def test_invalid_cursor(self):
+        for cursor in ('!!!', 'YWJj', 'eHx5'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f'/api/recipes/?cursor={cursor}')
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CountStrategyTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipes = create_dataset(cls.reader, authors=2)
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            return self.client.get(url).data
+
+    def test_cached_per_filter(self):
+        first = self.get('/api/recipes/?tags=lunch&tags=dinner', 5)
+        self.assertEqual(first['count_strategy'], 'exact')
+        second = self.get('/api/recipes/?limit=3&tags=dinner&tags=lunch', 4)
+        self.assertEqual(second['count_strategy'], 'cached')
+        self.assertEqual(first['count'], second['count'])
+        other = self.get('/api/recipes/?is_favorited=1', 4)
+        self.assertEqual(other['count_strategy'], 'exact')
+        self.assertEqual(other['count'], len(self.recipes[::2]))
+
+    def test_invalidated_by_changes(self):
+        self.get('/api/users/subscriptions/', 3)
+        self.assertEqual(
+            self.get('/api/users/subscriptions/', 2)['count_strategy'],
+            'cached')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.subscriber.first().delete()
+        data = self.get('/api/users/subscriptions/', 3)
+        self.assertEqual(data['count_strategy'], 'exact')
+        self.assertEqual(data['count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].delete()
+        self.assertEqual(self.get('/api/recipes/', 4)['count'],
+                         len(self.recipes) - 1)
+
+    def test_not_cached_without_versions(self):
+        for _ in range(2):
+            self.assertEqual(
+                self.get('/api/users/', 2)['count_strategy'], 'exact')
@@ -0,0 +1,269 @@
+"""
+Бюджеты SQL-запросов для эндпоинтов API.
+
+Каждый бюджет задан точным числом и не должен зависеть от размера
+страницы и объема данных. При превышении assertNumQueries выводит
+список выполненных запросов.
+"""
+from api.snapshots import ingredient_snapshot, tag_snapshot
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.indexes import ingredient_index
+from recipes.models import Ingredient, Link, Recipe, Tag
+from recipes.short_links import encode_short_link, resolve_short_link
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .utils import TemporaryFilesMixin, create_dataset, create_user
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+SMALL_PAGE = 1
+LARGE_PAGE = 50
+
+
+class QueryBudgetTestCase(TemporaryFilesMixin, TestCase):
+    """Базовый класс с набором данных и проверками бюджета"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.stranger = create_user('stranger')
+        cls.recipes = create_dataset(cls.reader)
+        cls.recipe = cls.recipes[0]
+        cls.author = cls.recipe.author
+
+    def setUp(self):
+        ingredient_index.invalidate()
+        caches['responses'].clear()
+        tag_snapshot.clear()
+        ingredient_snapshot.clear()
+        self.anon_client = APIClient()
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+        self.stranger_client = APIClient()
+        self.stranger_client.force_authenticate(self.stranger)
+
+    def grow(self):
+        """Увеличивает объем данных в несколько раз"""
+        with self.captureOnCommitCallbacks(execute=True):
+            create_dataset(
+                self.reader, authors=8, recipes_per_author=6, prefix='extra')
+
+    def assertBudget(self, budget, client, url, method='get',
+                     expected_status=status.HTTP_200_OK, **kwargs):
+        """Бюджет запроса с холодным кешем ответов и чисел объектов"""
+        caches['responses'].clear()
+        with self.assertNumQueries(budget):
+            response = getattr(client, method)(url, **kwargs)
+        self.assertEqual(
+            response.status_code, expected_status, getattr(
+                response, 'data', None))
+        return response
+
+    def assertConstantBudget(self, budget, client, url):
+        """
+        Бюджет списка одинаков для маленькой и большой страницы,
+        а также после роста объема данных.
+        """
+        separator = '&' if '?' in url else '?'
+        for limit in (SMALL_PAGE, LARGE_PAGE):
+            with self.subTest(limit=limit):
+                self.assertBudget(
+                    budget, client, f'{url}{separator}limit={limit}')
+        self.grow()
+        with self.subTest(limit=LARGE_PAGE, grown=True):
+            return self.assertBudget(
+                budget, client, f'{url}{separator}limit={LARGE_PAGE}')
+
+
+class RecipeQueryBudgetTest(QueryBudgetTestCase):
+
+    def test_list_anonymous(self):
+        self.assertConstantBudget(4, self.anon_client, '/api/recipes/')
+
+    def test_list_authenticated(self):
+        self.assertConstantBudget(4, self.reader_client, '/api/recipes/')
+
+    def test_list_filtered(self):
+        url = ('/api/recipes/?tags=breakfast&tags=lunch'
+               f'&author={self.author.id}&is_favorited=1'
+               '&is_in_shopping_cart=1')
+        self.assertConstantBudget(6, self.reader_client, url)
+
+    def test_detail(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        for client in (self.anon_client, self.reader_client):
+            with self.subTest(client=client):
+                self.assertBudget(3, client, url)
+
+    # Записи в избранное и корзину идут в транзакции: в тестах она
+    # добавляет пару запросов SAVEPOINT/RELEASE. Каждая запись
+    # избранного, корзины и подписки сдвигает счетчик одним UPDATE.
+    def recipe_data(self, amount=1, count=30):
+        return {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': IMAGE,
+            'tags': list(Tag.objects.values_list('id', flat=True)),
+            'ingredients': [
+                {'id': ingredient, 'amount': amount}
+                for ingredient in Ingredient.objects.values_list(
+                    'id', flat=True)[:count]
+            ],
+        }
+
+    def test_create_and_update(self):
+        # При создании в очередь ставятся задачи копий изображения,
+        # ленты подписчиков и похожих рецептов, увеличивается счетчик
+        # рецептов автора.
+        response = self.assertBudget(
+            21, self.stranger_client, '/api/recipes/', method='post',
+            data=self.recipe_data(), format='json',
+            expected_status=status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['ingredients']), 30)
+        # Каждая удаленная строка состава (здесь их 5) проверяет корзины
+        # рецепта в сигнале post_delete.
+        data = self.recipe_data(amount=2, count=25)
+        del data['image']
+        response = self.assertBudget(
+            23, self.stranger_client, f'/api/recipes/{response.data["id"]}/',
+            method='patch', data=data, format='json')
+        self.assertEqual(
+            {item['amount'] for item in response.data['ingredients']}, {2})
+
+    def test_favorite(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        self.assertBudget(
+            6, self.stranger_client, url, method='post',
+            expected_status=status.HTTP_201_CREATED)
+        self.assertBudget(
+            7, self.stranger_client, url, method='delete',
+            expected_status=status.HTTP_204_NO_CONTENT)
+
+    def test_shopping_cart(self):
+        url = f'/api/recipes/{self.recipe.id}/shopping_cart/'
+        self.assertBudget(
+            10, self.stranger_client, url, method='post',
+            expected_status=status.HTTP_201_CREATED)
+        self.assertBudget(
+            10, self.stranger_client, url, method='delete',
+            expected_status=status.HTTP_204_NO_CONTENT)
+
+    def test_download_shopping_cart(self):
+        url = '/api/recipes/download_shopping_cart/'
+        for grow in (False, True):
+            if grow:
+                self.grow()
+            for file_format in ('txt', 'csv', 'pdf'):
+                with self.subTest(format=file_format, grown=grow):
+                    with self.assertNumQueries(1):
+                        response = self.reader_client.get(
+                            url, {'format': file_format})
+                        b''.join(response.streaming_content)
+
+    def test_get_link(self):
+        url = f'/api/recipes/{self.recipe.id}/get-link/'
+        self.assertBudget(5, self.anon_client, url)
+        response = self.assertBudget(2, self.anon_client, url)
+        self.assertEqual(
+            response.data['short-link'],
+            f'http://testserver/s/{encode_short_link(self.recipe.id)}/')
+
+    def test_short_link_redirect(self):
+        code = encode_short_link(self.recipe.id)
+        Link.objects.create(
+            recipe=self.recipe,
+            base_link=self.recipe.get_absolute_url(),
+            short_link=code
+        )
+        resolve_short_link.cache_clear()
+        response = self.assertBudget(
+            1, self.anon_client, f'/s/{code}/',
+            expected_status=status.HTTP_302_FOUND)
+        self.assertEqual(response.url, f'/recipes/{self.recipe.id}/')
+        self.assertBudget(
+            0, self.anon_client, f'/s/{code}/',
+            expected_status=status.HTTP_302_FOUND)
+        self.assertBudget(
+            1, self.anon_client, '/s/zzzz/',
+            expected_status=status.HTTP_404_NOT_FOUND)
+
+
+class UserQueryBudgetTest(QueryBudgetTestCase):
+
+    def test_list(self):
+        for client in (self.anon_client, self.reader_client):
+            with self.subTest(client=client):
+                self.assertConstantBudget(2, client, '/api/users/')
+
+    def test_detail(self):
+        url = f'/api/users/{self.author.id}/'
+        for client in (self.anon_client, self.reader_client):
+            with self.subTest(client=client):
+                self.assertBudget(1, client, url)
+
+    def test_me(self):
+        self.assertBudget(1, self.reader_client, '/api/users/me/')
+
+    def test_subscriptions(self):
+        self.assertConstantBudget(
+            3, self.reader_client, '/api/users/subscriptions/')
+
+    def test_subscriptions_recipes_limit(self):
+        response = self.assertConstantBudget(
+            3, self.reader_client,
+            '/api/users/subscriptions/?recipes_limit=2')
+        for author in response.data['results']:
+            expected = Recipe.objects.filter(
+                author=author['id']).values_list('id', flat=True)
+            self.assertEqual(
+                [recipe['id'] for recipe in author['recipes']],
+                list(expected[:2]))
+            self.assertEqual(author['recipes_count'], expected.count())
+            self.assertTrue(author['is_subscribed'])
+
+    def test_subscriptions_rank_only_page_authors(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(
+                '/api/users/subscriptions/?limit=1&recipes_limit=1')
+        window = [
+            query['sql'] for query in queries.captured_queries
+            if 'ROW_NUMBER' in query['sql']]
+        self.assertEqual(len(window), 1)
+        self.assertNotIn('users_subscription', window[0])
+        self.assertIn(
+            f'IN ({response.data["results"][0]["id"]})', window[0])
+
+    def test_subscribe(self):
+        url = f'/api/users/{self.author.id}/subscribe/'
+        self.assertBudget(
+            10, self.stranger_client, url, method='post',
+            expected_status=status.HTTP_201_CREATED)
+        self.assertBudget(
+            6, self.stranger_client, url, method='delete',
+            expected_status=status.HTTP_204_NO_CONTENT)
+
+
+class ReferenceQueryBudgetTest(QueryBudgetTestCase):
+
+    def test_tags(self):
+        tag = Tag.objects.first()
+        # Снимок справочника строится первым запросом, дальше без БД.
+        self.assertBudget(1, self.anon_client, '/api/tags/')
+        self.assertBudget(0, self.anon_client, '/api/tags/')
+        self.assertBudget(0, self.anon_client, f'/api/tags/{tag.id}/')
+
+    def test_ingredients(self):
+        ingredient = Ingredient.objects.first()
+        self.assertBudget(1, self.anon_client, '/api/ingredients/')
+        # Холодный индекс: запрос в ORM и построение индекса после ответа.
+        self.assertBudget(
+            2, self.anon_client, '/api/ingredients/?name=ингр')
+        self.assertBudget(
+            0, self.anon_client, '/api/ingredients/?name=ингр')
+        self.assertBudget(
+            0, self.anon_client, f'/api/ingredients/{ingredient.id}/')
@@ -0,0 +1,91 @@
+from io import StringIO
+from unittest import mock
+
+from api.representations import RECIPE
+from api.response_cache import get_cache
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet, SubscriptionViewSet, UserViewSet
+from django.core.management import call_command
+from django.test import TestCase
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+from .utils import create_dataset, create_user
+
+VARIANTS = {'320': {'png': 'variants/320.png', 'webp': 'variants/320.webp'}}
+
+
+class FastListRepresentationTest(TestCase):
+    """Быстрые представления списков дают те же байты, что сериализаторы"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        create_dataset(cls.reader, authors=3, recipes_per_author=3)
+        Recipe.objects.filter(pk__in=Recipe.objects.values('pk')[:2]).update(
+            image_variants=VARIANTS)
+        User.objects.filter(username='author0').update(
+            avatar_variants=VARIANTS)
+        User.objects.filter(username='author1').update(avatar='')
+        Recipe.objects.filter(author__username='author2').update(
+            name='Рецепт "с кавычками" и \\ слешем', text='Строка\nвторая')
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def assertSameBytes(self, client, view, url):
+        get_cache().clear()
+        fast = client.get(url)
+        get_cache().clear()
+        with mock.patch.object(view, 'representation', None):
+            slow = client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_recipes(self):
+        for url in ('/api/recipes/', '/api/recipes/?limit=100',
+                    '/api/recipes/?cursor=', '/api/recipes/?is_favorited=1'):
+            with self.subTest(url=url):
+                self.assertSameBytes(self.client, RecipeViewSet, url)
+                self.assertSameBytes(self.anonymous, RecipeViewSet, url)
+
+    def test_subscriptions(self):
+        for url in ('/api/users/subscriptions/',
+                    '/api/users/subscriptions/?recipes_limit=2',
+                    '/api/users/subscriptions/?cursor=&recipes_limit=1'):
+            with self.subTest(url=url):
+                self.assertSameBytes(self.client, SubscriptionViewSet, url)
+
+    def test_users(self):
+        for url in ('/api/users/', '/api/users/?limit=2&page=2'):
+            with self.subTest(url=url):
+                self.assertSameBytes(self.client, UserViewSet, url)
+                self.assertSameBytes(self.anonymous, UserViewSet, url)
+
+    def test_fast_path_used(self):
+        get_cache().clear()
+        with mock.patch.object(
+                RECIPE, 'represent', wraps=RECIPE.represent) as represent:
+            self.anonymous.get('/api/recipes/')
+        represent.assert_called()
+
+    def test_replaced_serializer_uses_regular_path(self):
+        class Serializer(RecipeSerializer):
+            pass
+
+        get_cache().clear()
+        with mock.patch.object(
+                RecipeViewSet, 'get_serializer_class',
+                return_value=Serializer), mock.patch.object(
+                RECIPE, 'represent', wraps=RECIPE.represent) as represent:
+            response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        represent.assert_not_called()
+
+    def test_benchmark_command(self):
+        output = StringIO()
+        call_command('benchmark_serialization', repeat=2, stdout=output)
+        self.assertIn('Подписки', output.getvalue())
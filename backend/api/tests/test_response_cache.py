@@ -0,0 +1,96 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from api.response_cache import get_stats, reset_stats
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from recipes.models import Favorite, IngredientInRecipe, Tag
+from recipes.versions import COUNTERS_SCOPE, VERSION_KEY
+from rest_framework.test import APIClient
+from users.models import Subscription
+
+from .utils import create_dataset, create_user
+
+
+class ResponseCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipes = create_dataset(cls.reader, authors=2)
+        cls.other = create_user('other')
+
+    def setUp(self):
+        caches['responses'].clear()
+        reset_stats()
+        self.client = APIClient()
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            return self.client.get(url)
+
+    def test_hit_after_miss(self):
+        first = self.get('/api/recipes/?tags=lunch&tags=breakfast', 5)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        second = self.get('/api/recipes/?tags=breakfast&tags=lunch&page=1', 0)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(
+            get_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_not_cached(self):
+        self.client.force_authenticate(self.reader)
+        response = self.get('/api/recipes/', 4)
+        self.assertNotIn('X-Cache', response)
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/recipes/?search=рецепт')
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(get_stats()['misses'], 0)
+
+    @override_settings(COUNTERS_VERSION_INTERVAL=0)
+    def test_invalidated_by_signals(self):
+        url = '/api/recipes/?limit=2'
+        changes = (
+            lambda: self.recipes[0].save(),
+            lambda: IngredientInRecipe.objects.filter(
+                recipe=self.recipes[1]).first().delete(),
+            lambda: self.recipes[2].tags.clear(),
+            lambda: Tag.objects.get(slug='dinner').save(),
+            lambda: Favorite.objects.create(
+                user=self.other, recipe=self.recipes[3]),
+            lambda: Subscription.objects.create(
+                user=self.other, author=self.recipes[3].author),
+        )
+        self.get(url, 4)
+        for change in changes:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertEqual(self.get(url, 4)['X-Cache'], 'MISS')
+            self.assertEqual(self.get(url, 0)['X-Cache'], 'HIT')
+
+    @override_settings(COUNTERS_VERSION_INTERVAL=60)
+    def test_counter_changes_published_once_per_interval(self):
+        # Часы подменяются, и опубликованная версия уходит в будущее:
+        # ключ версии удаляется до и после теста.
+        key = VERSION_KEY.format(COUNTERS_SCOPE)
+        cache.delete(key)
+        self.addCleanup(cache.delete, key)
+        url = '/api/recipes/?limit=2'
+        self.get(url, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.other, recipe=self.recipes[0])
+        self.assertEqual(self.get(url, 0)['X-Cache'], 'HIT')
+        with mock.patch('recipes.versions.time') as clock:
+            clock.time.return_value = time.time() + 60
+            self.assertEqual(self.get(url, 4)['X-Cache'], 'MISS')
+            self.assertEqual(self.get(url, 0)['X-Cache'], 'HIT')
+
+    def test_stats_command(self):
+        self.get('/api/recipes/', 4)
+        self.get('/api/recipes/', 0)
+        output = StringIO()
+        call_command('response_cache_stats', reset=True, stdout=output)
+        self.assertIn('Попаданий: 1, промахов: 1', output.getvalue())
+        self.assertEqual(get_stats()['hits'], 0)
@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from recipes.models import Ingredient, Recipe, ShoppingCart, ShoppingListItem
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .utils import create_dataset, create_user
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class DownloadShoppingCartTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipes = create_dataset(cls.reader)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def download(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content)
+
+    def test_txt_is_default_and_sorted(self):
+        response, content = self.download()
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8')
+        lines = content.decode().splitlines()
+        self.assertTrue(lines)
+        names = [line.split('  - ')[0] for line in lines]
+        self.assertEqual(names, sorted(names))
+
+    def test_csv(self):
+        response, content = self.download(format='csv')
+        self.assertIn('shopping_list.csv', response['Content-Disposition'])
+        lines = content.decode().splitlines()
+        self.assertEqual(
+            lines[0], 'Ингредиент,Количество,Единица измерения')
+        self.assertEqual(
+            len(lines) - 1, len(self.download()[1].decode().splitlines()))
+
+    def test_pdf(self):
+        response, content = self.download(format='pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        self.assertTrue(content.endswith(b'%%EOF\n'))
+        startxref = int(content.rsplit(b'startxref\n', 1)[1].split()[0])
+        self.assertTrue(content[startxref:].startswith(b'xref'))
+        self.assertIn(b'/FontFile2', content)
+        self.assertIn(b'/ToUnicode', content)
+        self.assertNotIn(b'/Image', content)
+
+    def test_unknown_format(self):
+        response = self.client.get(URL, {'format': 'doc'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_anonymous(self):
+        response = APIClient().get(URL)
+        self.assertEqual(
+            response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def assertShoppingListsConsistent(self):
+        output = StringIO()
+        call_command('rebuild_shopping_lists', verify=True, stdout=output)
+        self.assertIn('Списки покупок совпадают', output.getvalue())
+
+    def test_aggregate_follows_cart_and_recipe_changes(self):
+        first, second = self.recipes[1], self.recipes[2]
+        cart_url = '/api/recipes/{}/shopping_cart/'
+        self.client.post(cart_url.format(first.id))
+        self.client.post(cart_url.format(second.id))
+        self.client.delete(cart_url.format(self.recipes[0].id))
+        self.assertShoppingListsConsistent()
+
+        author = APIClient()
+        author.force_authenticate(first.author)
+        ingredients = list(Ingredient.objects.all()[:2])
+        response = author.patch(f'/api/recipes/{first.id}/', {
+            'name': first.name, 'text': first.text,
+            'cooking_time': first.cooking_time,
+            'tags': list(first.tags.values_list('id', flat=True)),
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 7}
+                for ingredient in ingredients],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertShoppingListsConsistent()
+
+        author.delete(f'/api/recipes/{first.id}/')
+        self.assertFalse(Recipe.objects.filter(id=first.id).exists())
+        self.assertShoppingListsConsistent()
+
+    def test_cascade_deletes_update_aggregate(self):
+        in_cart = self.recipes[0]
+        in_cart.author.delete()
+        self.assertFalse(Recipe.objects.filter(id=in_cart.id).exists())
+        self.assertShoppingListsConsistent()
+
+        reader = create_user('other_reader')
+        ShoppingCart.objects.create(user=reader, recipe=self.recipes[-1])
+        Ingredient.objects.filter(
+            ingredient_list__recipe=self.recipes[-1]).first().delete()
+        self.assertShoppingListsConsistent()
+        reader.delete()
+        self.assertShoppingListsConsistent()
+
+    def test_rebuild(self):
+        ShoppingListItem.objects.all().delete()
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assertShoppingListsConsistent()
+        self.assertTrue(self.download()[1])
@@ -0,0 +1,116 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from jobs.queue import INLINE, Worker
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            SimilarRecipe)
+from recipes.similar import IngredientVectors
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .utils import TemporaryFilesMixin, create_tags, create_user
+
+COMPOSITIONS = {
+    'Борщ': ('свекла', 'капуста', 'морковь', 'соль'),
+    'Щи': ('капуста', 'морковь', 'соль'),
+    'Винегрет': ('свекла', 'морковь', 'соль'),
+    'Омлет': ('яйцо', 'молоко', 'соль'),
+    'Блины': ('яйцо', 'молоко', 'мука', 'соль'),
+}
+
+
+@override_settings(SIMILAR_RECIPES_COUNT=2)
+class SimilarRecipesTest(TemporaryFilesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tags = create_tags()
+        cls.ingredients = {
+            name: Ingredient.objects.create(name=name, measurement_unit='г')
+            for names in COMPOSITIONS.values() for name in names
+            if not Ingredient.objects.filter(name=name).exists()}
+        cls.recipes = {
+            name: cls.create(name, ingredients)
+            for name, ingredients in COMPOSITIONS.items()}
+        call_command('build_similar_recipes', stdout=StringIO())
+
+    @classmethod
+    def create(cls, name, ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text=name,
+            image='recipes/images/recipe.png', cooking_time=10)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient=cls.ingredients[ingredient],
+                amount=1)
+            for ingredient in ingredients)
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def similar(self, name):
+        response = self.client.get(
+            f'/api/recipes/{self.recipes[name].id}/similar/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in response.data]
+
+    def test_top_k_by_shared_rare_ingredients(self):
+        self.assertEqual(self.similar('Омлет')[0], 'Блины')
+        self.assertEqual(self.similar('Блины')[0], 'Омлет')
+        self.assertCountEqual(self.similar('Борщ'), ['Щи', 'Винегрет'])
+        self.assertEqual(
+            SimilarRecipe.objects.filter(
+                recipe=self.recipes['Щи']).count(), 2)
+
+    def test_common_ingredient_weighs_less(self):
+        vectors = IngredientVectors.load()
+        row = vectors.rows[self.recipes['Борщ'].id]
+        self.assertLess(row[self.ingredients['соль'].id],
+                        row[self.ingredients['свекла'].id])
+        self.assertAlmostEqual(
+            sum(weight ** 2 for weight in row.values()), 1)
+
+    def test_neighbourhood_matches_full_load(self):
+        for min_count in (0, 50):
+            with mock.patch('recipes.similar.COMMON_MIN_COUNT', min_count):
+                full = IngredientVectors.load()
+                for recipe in self.recipes.values():
+                    around = IngredientVectors.load_around([recipe.id])
+                    self.assertEqual(
+                        around.neighbours(recipe.id, 4),
+                        full.neighbours(recipe.id, 4))
+        with mock.patch('recipes.similar.COMMON_MIN_COUNT', 0):
+            around = IngredientVectors.load_around(
+                [self.recipes['Омлет'].id])
+        self.assertEqual(
+            set(around.rows),
+            {self.recipes['Омлет'].id, self.recipes['Блины'].id})
+
+    def test_refreshed_after_save(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.post('/api/recipes/', {
+            'name': 'Оладьи', 'text': 'Оладьи', 'cooking_time': 10,
+            'image': 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAAB'
+                     'CAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5E'
+                     'rkJggg==',
+            'tags': [self.tags[0].id],
+            'ingredients': [
+                {'id': self.ingredients[name].id, 'amount': 1}
+                for name in ('яйцо', 'молоко', 'мука')],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        Worker(INLINE).run(once=True)
+        self.assertEqual(self.similar('Блины')[0], 'Оладьи')
+        new = Recipe.objects.get(name='Оладьи')
+        self.assertEqual(
+            self.client.get(f'/api/recipes/{new.id}/similar/').data[0][
+                'name'], 'Блины')
+
+    def test_unknown_recipe(self):
+        response = self.client.get('/api/recipes/0/similar/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,62 @@
+from api.serializers import IngredientSerializer, TagSerializer
+from api.snapshots import ReferenceSnapshot, ingredient_snapshot, tag_snapshot
+from django.test import TestCase
+from recipes.models import Ingredient, Tag
+from recipes.versions import TAGS
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .utils import TemporaryFilesMixin, create_ingredients, create_tags
+
+
+class ReferenceSnapshotTest(TemporaryFilesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags()
+        cls.ingredients = create_ingredients()
+
+    def setUp(self):
+        tag_snapshot.clear()
+        ingredient_snapshot.clear()
+        self.client = APIClient()
+
+    def test_same_bytes_as_serializer(self):
+        renderer = JSONRenderer()
+        cases = (
+            ('/api/tags/', TagSerializer(Tag.objects.all(), many=True)),
+            ('/api/ingredients/', IngredientSerializer(
+                Ingredient.objects.all(), many=True)),
+            (f'/api/tags/{self.tags[1].id}/', TagSerializer(self.tags[1])),
+            (f'/api/ingredients/{self.ingredients[5].id}/',
+             IngredientSerializer(self.ingredients[5])),
+        )
+        for url, serializer in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertEqual(
+                    response.content, renderer.render(serializer.data))
+
+    def test_missing_object(self):
+        self.client.get('/api/tags/')
+        response = self.client.get('/api/tags/0/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_shared_between_workers(self):
+        self.client.get('/api/tags/')
+        worker = ReferenceSnapshot('tags', Tag, TagSerializer, TAGS)
+        with self.assertNumQueries(0):
+            response = worker.list_response()
+        self.assertEqual(len(response.content), len(
+            self.client.get('/api/tags/').content))
+
+    def test_swapped_on_change(self):
+        self.client.get('/api/tags/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Десерт', slug='dessert')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tags/')
+        self.assertIn('dessert', [tag['slug'] for tag in response.json()])
@@ -0,0 +1,87 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, Tag
+from recipes.tag_masks import MASK_BITS
+from rest_framework.test import APIClient
+
+from .utils import create_ingredients, create_recipes, create_tags, create_user
+
+URL = '/api/recipes/'
+
+
+class TagMaskTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags()
+        cls.recipes = create_recipes(
+            create_user('author'), 6, cls.tags, create_ingredients(10))
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['responses'].clear()
+
+    def assertMasksMatchTags(self):
+        for recipe in Recipe.objects.prefetch_related('tags'):
+            self.assertEqual(recipe.tags_mask, sum(
+                1 << tag.bit for tag in recipe.tags.all()))
+
+    def ids(self, *slugs):
+        response = self.client.get(URL, {'tags': slugs, 'limit': 100})
+        return [item['id'] for item in response.data['results']]
+
+    def test_bits_are_assigned(self):
+        self.assertEqual(
+            sorted(tag.bit for tag in self.tags), list(range(len(self.tags))))
+        self.assertMasksMatchTags()
+
+    def test_any_of_tags_without_duplicates(self):
+        breakfast, lunch, dinner = (tag.slug for tag in self.tags)
+        expected = [recipe.id for recipe in reversed(self.recipes)]
+        self.assertEqual(self.ids(breakfast, lunch, dinner), expected)
+        self.assertEqual(self.ids(dinner), [
+            recipe.id for recipe in reversed(self.recipes)
+            if recipe.tags.filter(slug=dinner).exists()])
+        with CaptureQueriesContext(connection) as queries:
+            self.ids(breakfast, lunch)
+        recipe_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'tags_mask' in query['sql']]
+        self.assertTrue(recipe_queries)
+        for sql in recipe_queries:
+            self.assertNotIn('recipes_recipe_tags', sql)
+            self.assertNotIn('DISTINCT', sql)
+
+    def test_masks_follow_tag_changes(self):
+        recipe = self.recipes[2]
+        recipe.tags.set(self.tags[1:2])
+        recipe.tags.add(self.tags[0])
+        self.tags[2].tag_recipe.add(recipe)
+        self.tags[1].tag_recipe.clear()
+        self.assertMasksMatchTags()
+        recipe.tags.clear()
+        self.assertMasksMatchTags()
+        self.assertNotIn(recipe.id, self.ids(self.tags[0].slug))
+
+    def test_deleted_tag_frees_bit(self):
+        bit = self.tags[0].bit
+        self.tags[0].delete()
+        self.assertMasksMatchTags()
+        self.assertEqual(Tag.objects.create(name='Десерт', slug='dessert').bit,
+                         bit)
+
+    def test_tags_beyond_mask_use_join(self):
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag-{number}', bit=number)
+            for number in range(len(self.tags), MASK_BITS))
+        extra = Tag.objects.create(name='Лишний', slug='extra')
+        self.assertIsNone(extra.bit)
+        self.recipes[0].tags.add(extra)
+        self.recipes[1].tags.add(extra)
+        self.assertEqual(
+            self.ids(extra.slug, self.tags[0].slug),
+            [recipe.id for recipe in reversed(self.recipes)
+             if recipe.tags.filter(
+                 slug__in=(extra.slug, self.tags[0].slug)).exists()])
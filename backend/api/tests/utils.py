@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+TEMPORARY_DIRS = ('MEDIA_ROOT', 'SNAPSHOT_DIR')
+
+
+class TemporaryFilesMixin:
+    """
+    Загрузки и снимки справочников тестов класса пишутся во временные
+    каталоги, которые удаляются после тестов класса.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temporary_dirs = override_settings(**{
+            name: tempfile.mkdtemp() for name in TEMPORARY_DIRS})
+        cls.temporary_dirs.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls.remove_temporary_dirs()
+            raise
+
+    @classmethod
+    def remove_temporary_dirs(cls):
+        for name in TEMPORARY_DIRS:
+            shutil.rmtree(getattr(settings, name), ignore_errors=True)
+        cls.temporary_dirs.disable()
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls.remove_temporary_dirs()
+
+
+TAGS = (('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'))
+INGREDIENTS_PER_RECIPE = 5
+
+
+def create_tags():
+    """Создает набор тегов"""
+    return [Tag.objects.get_or_create(name=name, slug=slug)[0]
+            for name, slug in TAGS]
+
+
+def create_ingredients(count=30):
+    """Создает справочник ингредиентов"""
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(count)
+    )
+    return list(Ingredient.objects.all())
+
+
+def create_user(username):
+    """Создает пользователя"""
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@foodgram.ru',
+        password='Foodgram-Pass-123',
+        first_name=username,
+        last_name=username,
+        avatar='users/avatars/avatar.png',
+    )
+
+
+def create_recipes(author, count, tags, ingredients):
+    """Создает рецепты автора с тегами и ингредиентами"""
+    recipes = []
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Рецепт {author.username} {number}',
+            text='Описание рецепта',
+            image='recipes/images/recipe.png',
+            cooking_time=number + 1,
+        )
+        recipe.tags.set(tags[:number % len(tags) + 1])
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % len(ingredients)],
+                amount=shift + 1
+            )
+            for shift in range(INGREDIENTS_PER_RECIPE)
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+def create_dataset(reader, authors=4, recipes_per_author=4, prefix='author'):
+    """
+    Наполняет базу авторами с рецептами. Читатель подписывается на
+    всех авторов и добавляет каждый второй рецепт в избранное и корзину.
+    """
+    tags = create_tags()
+    ingredients = list(Ingredient.objects.all()) or create_ingredients()
+    start = User.objects.filter(username__startswith=prefix).count()
+    recipes = []
+    for number in range(start, start + authors):
+        author = create_user(f'{prefix}{number}')
+        Subscription.objects.create(user=reader, author=author)
+        recipes += create_recipes(
+            author, recipes_per_author, tags, ingredients)
+    for recipe in recipes[::2]:
+        Favorite.objects.create(user=reader, recipe=recipe)
+        ShoppingCart.objects.create(user=reader, recipe=recipe)
+    return recipes
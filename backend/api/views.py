@@ -1,20 +1,27 @@
-import random
-import string
-
 from api.serializers import (CustomUserSerializer, IngredientSerializer,
                              RecipeSerializer, RecipesShortSerializer,
                              RecipeWriteSerializer, ShortLinkSerialiser,
                              SubscribedSerislizer, SubscriptionsSerializer,
                              TagSerializer, UserAvatarSerialiser)
-from django.db.models import Sum
-from django.http import Http404, HttpResponse
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value, Window, prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
+from recipes.cookable import find_cookable
+from recipes.feed import feed_queryset, feed_recipe_ids
+from recipes.indexes import ingredient_index
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Link,
-                            Recipe, ShoppingCart, Tag)
+                            Recipe, ShoppingCart, SimilarRecipe, Tag)
+from recipes.short_links import encode_short_link, resolve_short_link
+from recipes.versions import COUNTERS_SCOPE, INGREDIENTS, RECIPES, TAGS
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import (SAFE_METHODS, AllowAny,
                                         IsAuthenticated,
@@ -23,34 +30,196 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from users.models import Subscription, User
 
+from .conditional import conditional_get
 from .filters import IngredientFilter, RecipeFilter
-from .paginators import PageLimitPagination
+from .paginators import FeedPagination, KeysetPagination, PageLimitPagination
 from .permissions import IsOwnerAdminOrReadOnly
+from .renderers import (CsvRenderer, FormatQueryNegotiation, PdfRenderer,
+                        TxtRenderer)
+from .representations import RECIPE, SUBSCRIPTION, USER
+from .response_cache import cache_anonymous_response
+from .shopping_list import shopping_list_rows
+from .snapshots import ingredient_snapshot, tag_snapshot
+
+
+def annotate_is_subscribed(queryset, user):
+    """Добавляет к queryset пользователей флаг подписки на них user"""
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField()))
+    return queryset.annotate(is_subscribed=Exists(
+        Subscription.objects.filter(user=user, author=OuterRef('pk'))))
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None"""
+    recipes_limit = request.query_params.get('recipes_limit', '')
+    if recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
+
+
+def get_cookable_params(request):
+    """
+    Id ингредиентов из параметра ingredients (повторами или через
+    запятую) и допустимое число недостающих из параметра missing.
+    """
+    values = [
+        value for param in request.query_params.getlist('ingredients')
+        for value in param.split(',') if value
+    ]
+    missing = request.query_params.get('missing', '0')
+    if not all(value.isdigit() for value in values):
+        raise ValidationError({'ingredients': 'Ожидаются id ингредиентов.'})
+    if not missing.isdigit():
+        raise ValidationError({'missing': 'Ожидается целое число.'})
+    return {int(value) for value in values}, int(missing)
+
+
+def top_recipes_per_author(authors, limit):
+    """
+    Первые limit рецептов каждого автора одним запросом:
+    нумеруем рецепты окном ROW_NUMBER() в разрезе автора.
+    """
+    ranked = Recipe.objects.filter(author__in=authors).annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('author')],
+            order_by=[F('pub_date').desc(), F('id').desc()]
+        )
+    ).values('id', 'row_number')
+    sql, params = ranked.query.sql_with_params()
+    return Recipe.objects.filter(pk__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) ranked '
+        'WHERE ranked.row_number <= %s',
+        (*params, limit)
+    ))
+
+
+def prefetch_author_recipes(subscriptions, recipes_limit=None):
+    """
+    Загружает первые рецепты авторов подписок в
+    author.limited_recipes. Окно ROW_NUMBER() считается только по
+    авторам переданных подписок, то есть по одной странице.
+    """
+    if recipes_limit is None:
+        recipes = Recipe.objects.all()
+    else:
+        recipes = top_recipes_per_author(
+            [subscription.author_id for subscription in subscriptions],
+            recipes_limit)
+    prefetch_related_objects(subscriptions, Prefetch(
+        'author__author_recipe',
+        queryset=recipes,
+        to_attr='limited_recipes'
+    ))
+    return subscriptions
+
+
+class ReferenceSnapshotMixin:
+    """
+    Список без параметров и отдельные объекты справочника
+    отдаются готовыми байтами из снимка в памяти.
+    """
+    snapshot = None
+
+    def use_snapshot(self, request):
+        return request.accepted_renderer.format == 'json'
+
+    def list_from_memory(self, request):
+        """Ответ без обращения к БД или None"""
+        if self.use_snapshot(request) and not request.query_params:
+            return self.snapshot.list_response()
+        return None
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        if self.use_snapshot(request):
+            response = self.snapshot.detail_response(kwargs['pk'])
+            if response is not None:
+                return response
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        response = self.list_from_memory(request)
+        if response is not None:
+            return response
+        return super().list(request, *args, **kwargs)
+
+
+class FastListMixin:
+    """
+    Список строится представлением из api.representations, а не
+    сериализатором: те же байты ответа, но без обхода полей DRF на
+    каждом объекте. Если сериализатор списка подменен (например, в
+    настройках djoser), работает обычный путь.
+    """
+    representation = None
+
+    def use_representation(self):
+        return (
+            self.representation is not None
+            and self.get_serializer_class()
+            is self.representation.serializer_class
+        )
 
+    def list(self, request, *args, **kwargs):
+        if not self.use_representation():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.representation(queryset, request))
+        return self.get_paginated_response(
+            self.representation(page, request))
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(ReferenceSnapshotMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для модели """
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     permission_classes = (AllowAny,)
-
-
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    version_scopes = (INGREDIENTS,)
+    user_state = False
+    snapshot = ingredient_snapshot
+
+    def list_from_memory(self, request):
+        """Поиск по префиксу обслуживает индекс в памяти"""
+        name = request.query_params.get('name')
+        if name and 'search' not in request.query_params:
+            ingredients = ingredient_index.search(name)
+            if ingredients is not None:
+                return Response(ingredients)
+            return None
+        return super().list_from_memory(request)
+
+
+class TagViewSet(ReferenceSnapshotMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для модели """
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
+    version_scopes = (TAGS,)
+    user_state = False
+    snapshot = tag_snapshot
 
 
-class UserViewSet(UserViewSet):
+class UserViewSet(FastListMixin, UserViewSet):
     """ViewSet для оработки Пользователей"""
+    representation = USER
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = PageLimitPagination
 
+    def get_queryset(self):
+        """Аннотируем пользователей признаком подписки текущего юзера"""
+        return annotate_is_subscribed(
+            super().get_queryset(), self.request.user)
+
     def get_permissions(self):
         """
         Переопределяем get_permissions для доступа только авторизованным
@@ -82,9 +251,13 @@ class UserViewSet(UserViewSet):
                 return Response(f'Вы уже подписаны на {author}',
                                 status=status.HTTP_400_BAD_REQUEST)
             serializer.is_valid()
-            serializer.save()
-            return Response(serializer.data,
-                            status=status.HTTP_201_CREATED)
+            subscription = Subscription.objects.select_related(
+                'author').get(pk=serializer.save().pk)
+            prefetch_author_recipes([subscription], get_recipes_limit(request))
+            return Response(
+                SubscriptionsSerializer(
+                    subscription, context={'request': request}).data,
+                status=status.HTTP_201_CREATED)
         if change_subscription_status.exists():
             change_subscription_status.delete()
             return Response(f'Вы отписались от {author}',
@@ -121,13 +294,56 @@ class UserViewSet(UserViewSet):
                         status=status.HTTP_400_BAD_REQUEST)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(FastListMixin, viewsets.ModelViewSet):
     """ViewSet Для модели рецептов"""
+    representation = RECIPE
     queryset = Recipe.objects.all()
     permission_classes = (IsOwnerAdminOrReadOnly,)
-    pagination_class = PageLimitPagination
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-pub_date', '-id')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    version_scopes = (RECIPES, COUNTERS_SCOPE)
+    user_state = True
+
+    @conditional_get
+    @cache_anonymous_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Рецепты с автором, тегами и ингредиентами, загруженными
+        заранее, и флагами избранного/корзины текущего пользователя.
+        """
+        user = self.request.user
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_list',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient')
+            )
+        )
+        if user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return queryset.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author')))
+        )
 
     def get_serializer_class(self):
         """Выбор сериализатора по методу запроса"""
@@ -150,7 +366,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     {'errors': f'Повторно-\"{recipe.name}\" добавить нельзя'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            model.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                model.objects.create(user=user, recipe=recipe)
             serializer = RecipesShortSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -162,7 +379,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                 status=status.HTTP_404_NOT_FOUND)
             obj = model.objects.filter(user=user, recipe=recipe)
             if obj.exists():
-                obj.delete()
+                with transaction.atomic():
+                    obj.delete()
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(
                 {'errors': f'В избранном нет рецепта \"{recipe.name}\"'},
@@ -185,75 +403,118 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Метод для управления списком покупок"""
         return self.general_method(request, pk, ShoppingCart)
 
-    @staticmethod
-    def ingredients_to_txt(ingredients):
-        """Метод для объединения ингредиентов в список для загрузки"""
-        shopping_list = ''
-        for ingredient in ingredients:
-            shopping_list += (
-                f"{ingredient['ingredient__name']}  - "
-                f"{ingredient['sum']}"
-                f"({ingredient['ingredient__measurement_unit']})\n"
+    @action(detail=True, methods=['GET'],
+            url_path='similar', url_name='similar',
+            )
+    def similar(self, request, pk):
+        """Рецепты с похожим составом, от самых похожих"""
+        ids = list(SimilarRecipe.objects.filter(
+            recipe=pk).values_list('similar', flat=True))
+        if not ids:
+            get_object_or_404(Recipe, id=pk)
+        recipes = Recipe.objects.in_bulk(ids)
+        return Response(RecipesShortSerializer(
+            [recipes[key] for key in ids if key in recipes],
+            many=True, context={'request': request}).data)
+
+    @action(detail=False, methods=['GET'],
+            pagination_class=PageLimitPagination,
+            url_path='cookable', url_name='cookable',
             )
-        return shopping_list
+    def cookable(self, request):
+        """
+        Рецепты, которые можно приготовить из имеющихся ингредиентов,
+        если докупить не больше missing. В ответе поле missing -
+        сколько ингредиентов не хватает.
+        """
+        page = self.paginate_queryset(find_cookable(
+            *get_cookable_params(request)))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page])
+        found = [
+            (recipes[recipe_id], missing) for recipe_id, missing in page
+            if recipe_id in recipes
+        ]
+        data = self.get_serializer(
+            [recipe for recipe, _ in found], many=True).data
+        for item, (_, missing) in zip(data, found):
+            item['missing'] = missing
+        return self.get_paginated_response(data)
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedPagination,
+            url_path='feed', url_name='feed',
+            )
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь"""
+        page = self.paginate_queryset(feed_queryset(request.user))
+        ids = feed_recipe_ids(page)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['GET'],
             permission_classes=[IsAuthenticated, ],
+            renderer_classes=(TxtRenderer, CsvRenderer, PdfRenderer),
+            content_negotiation_class=FormatQueryNegotiation,
             url_path='download_shopping_cart',
             url_name='download_shopping_cart',
             )
     def download_shopping_cart(self, request):
         """Метод для загрузки ингредиентов и их количества
-         для выбранных рецептов"""
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__recipe_shopping__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(sum=Sum('amount'))
-        shopping_list = self.ingredients_to_txt(ingredients)
-        return HttpResponse(shopping_list, content_type='text/plain')
-
-
-class SubscriptionViewSet(ListAPIView):
+         для выбранных рецептов в формате txt, csv или pdf"""
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(shopping_list_rows(request.user)),
+            content_type=renderer.get_content_type()
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"')
+        return response
+
+
+class SubscriptionViewSet(FastListMixin, ListAPIView):
     """ViewSet для отображения страницы подписок пользователя"""
+    representation = SUBSCRIPTION
     serializer_class = SubscriptionsSerializer
     permission_classes = (IsAuthenticated,)
-    pagination_class = PageLimitPagination
+    pagination_class = KeysetPagination
+    cursor_ordering = ('subscription_date', 'id')
+    version_scopes = ()
+    user_state = True
 
     def get_queryset(self):
-        user = self.request.user
-        return user.subscriber.all()
-
+        return self.request.user.subscriber.select_related('author')
 
-def generate_short_url():
-    characters = string.ascii_letters + string.digits
-    short_url = ''.join(random.choices(characters, k=4))
-    return "http:/localhost/s/" + short_url
+    def paginate_queryset(self, queryset):
+        """Рецепты загружаются только для авторов страницы"""
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            prefetch_author_recipes(page, get_recipes_limit(self.request))
+        return page
 
 
 class GetShortLink(APIView):
-    repmission_classes = (AllowAny,)
+    permission_classes = (AllowAny,)
 
     def get(self, request, recipe_id):
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        short_url = generate_short_url()
         link_obj, _ = Link.objects.get_or_create(
             recipe=recipe,
             defaults={'base_link': recipe.get_absolute_url(),
-                      'short_link': short_url}
+                      'short_link': encode_short_link(recipe.id)}
         )
-        serializer = ShortLinkSerialiser(link_obj)
+        serializer = ShortLinkSerialiser(
+            link_obj, context={'request': request})
         return Response(serializer.data)
 
 
 def redirect_to_full_link(request, short_link):
     try:
-        link_obj = Link.objects.get(
-            short_link="http:/localhost/s/" + short_link
-        )
-        full_link = link_obj.base_link.replace('/api', '', 1)
-        return redirect(full_link)
+        full_link = resolve_short_link(short_link)
     except Link.DoesNotExist:
         return HttpResponse(
             'Ссылка не найдена', status=status.HTTP_404_NOT_FOUND)
+    return redirect(full_link.replace('/api', '', 1))
@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'status',
+        'attempts',
+        'duration',
+        'created_at',
+        'finished_at',)
+    search_fields = ('name',)
+    list_filter = ('status',)
+    readonly_fields = ('started_at', 'finished_at', 'duration', 'locked_by',
+                       'locked_until', 'last_error')
+    empty_value_display = 'Не задано'
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand
+from jobs.queue import POOLS, THREAD, Worker
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pool',
+            choices=POOLS,
+            default=THREAD,
+            help='Где выполнять задачи: потоки, процессы или inline'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=os.cpu_count(),
+            help='Размер пула и пачки задач'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Пауза между опросами пустой очереди, с'
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(options['pool'], options['concurrency'])
+        processed = worker.run(
+            once=options['once'], poll_interval=options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано задач: {processed}'))
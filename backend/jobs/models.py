@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+PRUNE_BATCH_SIZE = 1000
+
+
+class JobQuerySet(models.QuerySet):
+
+    def claim(self, worker, limit):
+        """
+        Забирает до limit готовых к запуску задач для воркера worker.
+
+        Готовы задачи в очереди, время которых подошло, и запущенные
+        задачи с истекшим таймаутом видимости (их воркер, вероятно,
+        упал). Повторная проверка условия в UPDATE не дает двум
+        воркерам забрать одну задачу.
+        """
+        now = timezone.now()
+        self.filter(
+            status=Job.RUNNING, locked_until__lt=now,
+            attempts__gte=F('max_attempts')
+        ).update(
+            status=Job.FAILED, locked_until=None, finished_at=now,
+            last_error='Превышен таймаут видимости'
+        )
+        available = self.filter(
+            Q(status=Job.QUEUED, run_after__lte=now)
+            | Q(status=Job.RUNNING, locked_until__lt=now)
+        )
+        with transaction.atomic():
+            candidates = available.order_by('run_after', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            ids = list(candidates.values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            available.filter(id__in=ids).update(
+                status=Job.RUNNING,
+                locked_by=worker,
+                locked_until=now + timedelta(
+                    seconds=settings.JOB_VISIBILITY_TIMEOUT),
+                attempts=F('attempts') + 1,
+                started_at=now,
+            )
+        return list(self.filter(
+            id__in=ids, status=Job.RUNNING, locked_by=worker))
+
+    def prune(self):
+        """
+        Удаляет выполненные задачи старше JOB_DONE_RETENTION и
+        упавшие старше JOB_FAILED_RETENTION пачками по
+        PRUNE_BATCH_SIZE. Возвращает число удаленных.
+        """
+        now = timezone.now()
+        deleted = 0
+        for status, retention in (
+                (Job.DONE, settings.JOB_DONE_RETENTION),
+                (Job.FAILED, settings.JOB_FAILED_RETENTION)):
+            old = self.filter(
+                status=status,
+                finished_at__lt=now - timedelta(seconds=retention))
+            while True:
+                ids = list(old.order_by().values_list(
+                    'id', flat=True)[:PRUNE_BATCH_SIZE])
+                if not ids:
+                    break
+                deleted += self.filter(id__in=ids).delete()[0]
+        return deleted
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на базе таблицы БД"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        verbose_name='Функция задачи',
+        max_length=255
+    )
+    args = models.JSONField(
+        verbose_name='Позиционные аргументы',
+        default=list
+    )
+    kwargs = models.JSONField(
+        verbose_name='Именованные аргументы',
+        default=dict
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток',
+        default=3
+    )
+    run_after = models.DateTimeField(
+        verbose_name='Запустить не раньше',
+        default=timezone.now
+    )
+    locked_by = models.CharField(
+        verbose_name='Воркер',
+        max_length=128,
+        blank=True
+    )
+    locked_until = models.DateTimeField(
+        verbose_name='Занята до',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True
+    )
+    started_at = models.DateTimeField(
+        verbose_name='Запущена',
+        null=True,
+        blank=True
+    )
+    finished_at = models.DateTimeField(
+        verbose_name='Завершена',
+        null=True,
+        blank=True
+    )
+    duration = models.FloatField(
+        verbose_name='Длительность, с',
+        null=True,
+        blank=True
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True
+    )
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after'],
+                name='job_status_run_after_idx'),
+            models.Index(
+                fields=['status', 'finished_at'],
+                name='job_status_finished_at_idx')]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
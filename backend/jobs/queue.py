@@ -0,0 +1,157 @@
+import os
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+INLINE = 'inline'
+THREAD = 'thread'
+PROCESS = 'process'
+POOLS = (INLINE, THREAD, PROCESS)
+
+
+def job(func=None, *, max_attempts=3):
+    """
+    Регистрирует функцию как фоновую задачу. Аргументы задачи
+    хранятся в JSON, поэтому передаются только простые значения.
+    """
+    def decorator(func):
+        func.job_name = f'{func.__module__}.{func.__qualname__}'
+        func.max_attempts = max_attempts
+        return func
+    if func is None:
+        return decorator
+    return decorator(func)
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Ставит задачу в очередь. Запись создается в текущей транзакции,
+    поэтому воркер увидит задачу только после ее фиксации, а при
+    откате задачи не будет вовсе.
+    """
+    return Job.objects.create(
+        name=func.job_name,
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=func.max_attempts
+    )
+
+
+def execute(name, args, kwargs):
+    """Выполняет задачу: время выполнения и текст ошибки или None"""
+    started = time.perf_counter()
+    try:
+        func = import_string(name)
+        if getattr(func, 'job_name', None) != name:
+            raise LookupError(f'{name} не зарегистрирована как задача')
+        func(*args, **kwargs)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return time.perf_counter() - started, error
+
+
+def execute_in_pool(name, args, kwargs):
+    """Выполнение в потоке или процессе пула со своими соединениями"""
+    try:
+        return execute(name, args, kwargs)
+    finally:
+        connections.close_all()
+
+
+class Worker:
+    """
+    Воркер очереди: забирает пачку задач, выполняет их в пуле
+    потоков, процессов или в текущем потоке (inline) и записывает
+    результат, время выполнения и ошибки. Неудачные задачи
+    повторяются с экспоненциальной задержкой до max_attempts раз.
+    Раз в JOB_PRUNE_INTERVAL воркер удаляет старые завершенные задачи.
+    """
+
+    def __init__(self, pool=THREAD, concurrency=4):
+        self.pool = pool
+        self.concurrency = concurrency
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.pruned_at = None
+
+    def prune_if_due(self):
+        now = time.monotonic()
+        if (self.pruned_at is None
+                or now - self.pruned_at >= settings.JOB_PRUNE_INTERVAL):
+            self.pruned_at = now
+            Job.objects.prune()
+
+    def make_executor(self):
+        if self.pool == THREAD:
+            return ThreadPoolExecutor(self.concurrency)
+        if self.pool == PROCESS:
+            # Дочерние процессы не должны наследовать соединения с БД.
+            connections.close_all()
+            return ProcessPoolExecutor(self.concurrency)
+        return None
+
+    def run(self, once=False, poll_interval=1.0):
+        """
+        Обрабатывает очередь. С once=True завершается, когда
+        готовых к запуску задач не осталось. Возвращает число
+        обработанных задач.
+        """
+        executor = self.make_executor()
+        processed = 0
+        try:
+            while True:
+                self.prune_if_due()
+                jobs = Job.objects.claim(
+                    f'{self.name}:{uuid.uuid4().hex}', self.concurrency)
+                if not jobs:
+                    if once:
+                        return processed
+                    time.sleep(poll_interval)
+                    continue
+                if executor is None:
+                    results = [
+                        execute(job.name, job.args, job.kwargs)
+                        for job in jobs
+                    ]
+                else:
+                    results = list(executor.map(
+                        execute_in_pool,
+                        *zip(*((job.name, job.args, job.kwargs)
+                               for job in jobs))
+                    ))
+                for job, (duration, error) in zip(jobs, results):
+                    self.finish(job, duration, error)
+                processed += len(jobs)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    @staticmethod
+    def finish(job, duration, error):
+        now = timezone.now()
+        update = {
+            'duration': duration, 'locked_until': None, 'finished_at': now}
+        if error is None:
+            update['status'] = Job.DONE
+        elif job.attempts < job.max_attempts:
+            update.update(
+                status=Job.QUEUED,
+                last_error=error,
+                run_after=now + timedelta(
+                    seconds=settings.JOB_RETRY_DELAY
+                    * 2 ** (job.attempts - 1))
+            )
+        else:
+            update.update(status=Job.FAILED, last_error=error)
+        Job.objects.filter(
+            id=job.id, locked_by=job.locked_by).update(**update)
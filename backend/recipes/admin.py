@@ -2,9 +2,20 @@ from django.contrib import admin
 
 from .models import (Favorite, Ingredient, IngredientInRecipe, Link, Recipe,
                      ShoppingCart, Tag)
+from .paginators import EstimatedCountPaginator
 
 
-class IngredientAdmin(admin.ModelAdmin):
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Общие настройки списков для больших таблиц: оценочное число
+    строк и без второго COUNT(*) по всей таблице.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = 'Не задано'
+
+
+class IngredientAdmin(ScalableAdmin):
     list_display = (
         'name',
         'measurement_unit',)
@@ -12,7 +23,6 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     list_filter = ('measurement_unit',)
     list_display_links = ('name',)
-    empty_value_display = 'Не задано'
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -26,61 +36,84 @@ class TagAdmin(admin.ModelAdmin):
     empty_value_display = 'Не задано'
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class IngredientInRecipeInline(admin.TabularInline):
+    model = IngredientInRecipe
+    autocomplete_fields = ('ingredient',)
+    min_num = 1
+    extra = 0
+
+
+class RecipeAdmin(ScalableAdmin):
     list_display = (
         'name',
         'author',
         'pub_date',
-        'number_to_favorites')
+        'number_to_favorites',
+        'in_carts_count')
     list_editable = ()
-    search_fields = ('name', 'author')
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username__exact', 'author__email__exact')
     list_filter = ('tags',)
     list_display_links = ('name',)
-    empty_value_display = 'Не задано'
+    autocomplete_fields = ('author', 'tags')
+    inlines = (IngredientInRecipeInline,)
 
-    @admin.display(description="Добавлено в избранное")
+    @admin.display(description="Добавлено в избранное",
+                   ordering='favorites_count')
     def number_to_favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
 
-class FavoriteAdmin(admin.ModelAdmin):
+class IngredientInRecipeAdmin(ScalableAdmin):
     list_display = (
         'recipe',
-        'user',)
-    list_editable = ()
-    search_fields = ('recipe',)
-    list_filter = ()
-    list_display_links = ('recipe',)
-    empty_value_display = 'Не задано'
+        'ingredient',
+        'amount',)
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('recipe__name',)
+    autocomplete_fields = ('recipe', 'ingredient')
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
+class UserRecipeAdmin(ScalableAdmin):
+    """Избранное и корзина: связь пользователя с рецептом"""
     list_display = (
         'recipe',
         'user',)
     list_editable = ()
-    search_fields = ('recipe',)
+    list_select_related = ('recipe', 'user')
+    search_fields = ('recipe__name', 'user__username__exact',
+                     'user__email__exact')
     list_filter = ()
     list_display_links = ('recipe',)
-    empty_value_display = 'Не задано'
+    autocomplete_fields = ('recipe', 'user')
+
+    def get_readonly_fields(self, request, obj=None):
+        """
+        Записи только добавляются и удаляются: от этого зависят
+        счетчики рецепта и списки покупок.
+        """
+        if obj is not None:
+            return ('user', 'recipe')
+        return ()
 
 
-class LinkAdmin(admin.ModelAdmin):
+class LinkAdmin(ScalableAdmin):
     list_display = (
         'recipe',
         'base_link',
         'short_link',)
     list_editable = ()
-    search_fields = ()
+    list_select_related = ('recipe',)
+    search_fields = ('short_link__exact', 'recipe__name')
     list_filter = ()
-    list_display_links = ()
-    empty_value_display = 'Не задано'
+    list_display_links = ('short_link',)
+    autocomplete_fields = ('recipe',)
 
 
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, TagAdmin)
-admin.site.register(IngredientInRecipe)
+admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(Favorite, FavoriteAdmin)
-admin.site.register(ShoppingCart, ShoppingCartAdmin)
+admin.site.register(Favorite, UserRecipeAdmin)
+admin.site.register(ShoppingCart, UserRecipeAdmin)
 admin.site.register(Link, LinkAdmin)
@@ -0,0 +1,37 @@
+from django.db.models import Count, F, Q
+
+from .indexes import recipe_ingredient_index
+from .models import IngredientInRecipe
+
+
+def cookable_sql(ingredient_ids, missing):
+    """
+    Поиск по имеющимся ингредиентам запросом с GROUP BY по всем
+    составам. Запасной путь, пока индекс в памяти не построен, и
+    базовый вариант для сравнения в benchmark_cookable.
+    """
+    return list(IngredientInRecipe.objects.order_by().values(
+        'recipe'
+    ).annotate(
+        total=Count('pk'),
+        matched=Count('pk', filter=Q(ingredient__in=ingredient_ids))
+    ).annotate(
+        lacking=F('total') - F('matched')
+    ).filter(
+        matched__gt=0, lacking__lte=missing
+    ).order_by(
+        'lacking', '-matched', '-recipe_id'
+    ).values_list('recipe', 'lacking'))
+
+
+def find_cookable(ingredient_ids, missing=0):
+    """
+    Рецепты, для которых не хватает не больше missing ингредиентов:
+    пары (id, сколько не хватает) от самых полных совпадений.
+    """
+    if not ingredient_ids:
+        return []
+    result = recipe_ingredient_index.search(ingredient_ids, missing)
+    if result is None:
+        return cookable_sql(ingredient_ids, missing)
+    return result
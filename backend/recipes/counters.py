@@ -0,0 +1,64 @@
+from collections import namedtuple
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from users.models import Subscription, User
+
+from .models import Favorite, Recipe, ShoppingCart
+from .versions import COUNTERS_SCOPE, user_scope
+
+Counter = namedtuple('Counter', 'model field source source_field')
+
+COUNTERS = (
+    Counter(Recipe, 'favorites_count', Favorite, 'recipe'),
+    Counter(Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    Counter(User, 'recipes_count', Recipe, 'author'),
+    Counter(User, 'followers_count', Subscription, 'author'),
+)
+
+
+def change_counters(source, instance, delta):
+    """Сдвигает счетчики, которые считают объекты модели source"""
+    for counter in COUNTERS:
+        if counter.source is source:
+            counter.model.objects.filter(
+                pk=getattr(instance, f'{counter.source_field}_id')
+            ).update(**{counter.field: F(counter.field) + delta})
+
+
+def counter_scopes(source, instance):
+    """
+    Области версий ответов, в которых выводятся счетчики, сдвигаемые
+    объектами source: общие счетчики в списках рецептов и состояние
+    пользователей, чьи счетчики изменились.
+    """
+    return [COUNTERS_SCOPE] + [
+        user_scope(getattr(instance, f'{counter.source_field}_id'))
+        for counter in COUNTERS
+        if counter.source is source and counter.model is User
+    ]
+
+
+def actual_count(counter):
+    """Подзапрос с фактическим числом объектов для счетчика"""
+    return Coalesce(Subquery(
+        counter.source.objects.filter(
+            **{counter.source_field: OuterRef('pk')}
+        ).order_by().values(counter.source_field).annotate(
+            total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def find_mismatches(counter):
+    """Объекты, у которых счетчик расходится с фактическим числом"""
+    return counter.model.objects.annotate(
+        actual=actual_count(counter)
+    ).exclude(**{counter.field: F('actual')})
+
+
+def reconcile(counter):
+    """Пересчитывает счетчик у разошедшихся объектов"""
+    return counter.model.objects.filter(
+        pk__in=find_mismatches(counter).values('pk')
+    ).update(**{counter.field: actual_count(counter)})
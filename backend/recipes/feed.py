@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.db.models import Q
+from jobs.queue import job
+from users.models import Subscription, User
+
+from .models import FeedEntry, Recipe
+
+BATCH_SIZE = 1000
+
+
+@job
+def fan_out_recipe(recipe_id):
+    """
+    Раскладывает новый рецепт по лентам подписчиков автора. Авторов
+    с числом подписчиков выше FEED_FANOUT_LIMIT пропускаем: их
+    рецепты подмешиваются при чтении ленты, см. feed_queryset.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'author', 'pub_date', 'author__followers_count').first()
+    if (recipe is None
+            or recipe['author__followers_count']
+            > settings.FEED_FANOUT_LIMIT):
+        return
+    followers = Subscription.objects.filter(
+        author=recipe['author']).order_by().values_list('user', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                   pub_date=recipe['pub_date'])
+         for user_id in followers.iterator(chunk_size=BATCH_SIZE)),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Последние рецепты нового автора попадают в ленту подписчика"""
+    recipes = Recipe.objects.filter(
+        author=author_id,
+        author__followers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+         for recipe_id, pub_date in recipes],
+        ignore_conflicts=True
+    )
+
+
+def remove_from_feed(user_id, author_id):
+    """После отписки рецепты автора уходят из ленты"""
+    FeedEntry.objects.filter(user=user_id, recipe__author=author_id).delete()
+
+
+def feed_queryset(user):
+    """
+    Ключи ленты пользователя от новых к старым. Обычно это записи
+    FeedEntry, которые читаются по индексу (user, pub_date, recipe).
+    Если пользователь подписан на авторов, чьи рецепты не
+    раскладываются по лентам, выбираются рецепты: из ленты и
+    рецепты таких авторов.
+    """
+    pulled = list(User.objects.filter(
+        subscribed__user=user,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values_list('pk', flat=True))
+    entries = FeedEntry.objects.filter(user=user)
+    if not pulled:
+        return entries.only('recipe', 'pub_date').order_by(
+            '-pub_date', '-recipe_id')
+    return Recipe.objects.filter(
+        Q(pk__in=entries.values('recipe')) | Q(author__in=pulled)
+    ).only('pub_date').order_by('-pub_date', '-id')
+
+
+def feed_recipe_ids(page):
+    """Id рецептов страницы ленты из записей или самих рецептов"""
+    return [
+        item.recipe_id if isinstance(item, FeedEntry) else item.pk
+        for item in page
+    ]
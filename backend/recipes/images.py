@@ -0,0 +1,122 @@
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from jobs.queue import job
+from PIL import Image, UnidentifiedImageError, features
+
+from .versions import RECIPES, bump_versions
+
+WEBP = 'webp'
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': WEBP}
+# Сборки Pillow без libwebp строят копии только в формате оригинала.
+WEBP_SUPPORTED = features.check('webp')
+
+
+def variant_name(name, size, extension):
+    """Имя уменьшенной копии рядом с оригиналом: photo_480.webp"""
+    root, _ = os.path.splitext(name)
+    return f'{root}_{size}.{extension}'
+
+
+def save_image(image, name, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.save(buffer, image_format, quality=settings.IMAGE_VARIANT_QUALITY)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def generate_variants(name):
+    """
+    Уменьшенные копии изображения для всех размеров
+    IMAGE_VARIANT_SIZES в формате оригинала и в WebP.
+    Копии не бывают больше оригинала. Возвращает словарь
+    {размер: {расширение: имя файла}} или пустой словарь,
+    если файл не найден или не является изображением.
+    """
+    try:
+        with default_storage.open(name) as file:
+            original = Image.open(file)
+            original.load()
+    except (FileNotFoundError, UnidentifiedImageError, OSError):
+        return {}
+    image_format = original.format
+    if image_format not in FORMAT_EXTENSIONS:
+        image_format = 'PNG'
+    if original.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        original = original.convert('RGBA')
+    formats = {FORMAT_EXTENSIONS[image_format]: image_format}
+    if WEBP_SUPPORTED:
+        formats[WEBP] = 'WEBP'
+    variants = {}
+    for size in settings.IMAGE_VARIANT_SIZES:
+        image = original.copy()
+        image.thumbnail((size, size))
+        variants[str(size)] = {
+            extension: save_image(
+                image, variant_name(name, size, extension), variant_format)
+            for extension, variant_format in formats.items()
+        }
+    return variants
+
+
+def variants_match(name, variants):
+    """Копии построены для этого файла и текущего набора размеров"""
+    sizes = [str(size) for size in settings.IMAGE_VARIANT_SIZES]
+    return bool(name) and sorted(variants) == sorted(sizes) and all(
+        files and all(
+            file_name == variant_name(name, size, extension)
+            for extension, file_name in files.items())
+        for size, files in variants.items()
+    )
+
+
+def variant_names(variants):
+    return {name for files in variants.values() for name in files.values()}
+
+
+def delete_variants(variants):
+    for name in variant_names(variants):
+        default_storage.delete(name)
+
+
+def refresh_variants(instance, field, variants_field):
+    """
+    Строит копии изображения объекта, если оно сменилось,
+    и удаляет копии прежнего изображения.
+    """
+    name = getattr(instance, field).name or ''
+    old_variants = getattr(instance, variants_field)
+    if variants_match(name, old_variants):
+        return
+    variants = generate_variants(name) if name else {}
+    if variants == old_variants:
+        return
+    setattr(instance, variants_field, variants)
+    type(instance).objects.filter(pk=instance.pk).update(
+        **{variants_field: variants})
+    bump_versions(RECIPES)
+    for old_name in variant_names(old_variants) - variant_names(variants):
+        default_storage.delete(old_name)
+
+
+def image_changed(instance, field):
+    """
+    В объект загружен новый файл или файл удален, но изменения
+    еще не сохранены (вызывать до сохранения, в pre_save).
+    """
+    return not getattr(getattr(instance, field), '_committed', True)
+
+
+@job
+def refresh_variants_job(model_label, pk, field, variants_field):
+    """Фоновая задача построения копий для объекта"""
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is not None:
+        refresh_variants(instance, field, variants_field)
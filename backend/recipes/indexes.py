@@ -0,0 +1,302 @@
+import bisect
+import re
+from collections import Counter
+from threading import Lock, local
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CompositionChange, Ingredient, IngredientInRecipe, Recipe
+
+TRIGRAM_THRESHOLD = 0.3
+# Сколько изменений подряд индекс догоняет по журналу, а не строит
+# заново; более старые записи журнала удаляются.
+MAX_PENDING_CHANGES = 100
+WORD_SEPARATOR = re.compile(r'[^\w]+')
+
+
+def normalize(text):
+    """Приводит строку к виду для сравнения: регистр и ё/е не важны"""
+    return text.casefold().replace('ё', 'е')
+
+
+def trigrams(text):
+    """
+    Множество триграмм строки по правилам pg_trgm: каждое слово
+    дополняется двумя пробелами в начале и одним в конце.
+    """
+    result = set()
+    for word in WORD_SEPARATOR.split(normalize(text)):
+        if word:
+            padded = f'  {word} '
+            result.update(
+                padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class VersionedIndex:
+    """
+    Индекс в памяти процесса, построенный по таблице БД.
+
+    Версия индекса хранится в кеше Django, поэтому изменение данных
+    в одном процессе делает устаревшими индексы во всех процессах
+    с общим кешем. Устаревший индекс не отвечает на запросы, пока
+    не будет перестроен.
+    """
+    version_key = None
+
+    def __init__(self):
+        self._state = None
+        self._lock = Lock()
+        self.warm_requested = False
+
+    def current_version(self):
+        return cache.get(self.version_key, 0)
+
+    def invalidate(self):
+        """Помечает индексы всех процессов устаревшими"""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, timeout=None)
+
+    def load(self):
+        """Данные индекса, прочитанные из БД"""
+        raise NotImplementedError
+
+    def is_warm(self):
+        state = self._state
+        return state is not None and state[0] == self.current_version()
+
+    def build(self):
+        """Строит индекс по текущему содержимому таблицы"""
+        with self._lock:
+            version = self.current_version()
+            self._state = (version, self.load())
+            self.warm_requested = False
+
+    def warm_if_requested(self):
+        if self.warm_requested and not self.is_warm():
+            self.build()
+
+    def get_data(self):
+        """Данные актуального индекса или None, если он не построен"""
+        state = self._state
+        if state is None or state[0] != self.current_version():
+            self.warm_requested = True
+            return None
+        return state[1]
+
+
+class IngredientPrefixIndex(VersionedIndex):
+    """
+    Префиксный индекс названий ингредиентов.
+    Названия хранятся нормализованными в отсортированном списке,
+    поиск по префиксу - два бинарных поиска.
+    """
+    version_key = 'recipes:ingredient-prefix-index:version'
+
+    def load(self):
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (normalize(row['name']), row['id'])
+        )
+        return [normalize(row['name']) for row in rows], rows
+
+    def search(self, prefix):
+        """
+        Ингредиенты, название которых начинается с prefix.
+        Пока индекс не построен, возвращает None.
+        """
+        data = self.get_data()
+        if data is None:
+            return None
+        keys, rows = data
+        key = normalize(prefix)
+        start = bisect.bisect_left(keys, key)
+        end = bisect.bisect_left(keys, key + chr(0x10FFFF), lo=start)
+        return rows[start:end]
+
+
+class TrigramIndex(VersionedIndex):
+    """
+    Инвертированный индекс триграмм по текстовому полю модели
+    для нечеткого поиска там, где нет pg_trgm.
+    """
+
+    def __init__(self, model, field):
+        super().__init__()
+        self.model = model
+        self.field = field
+        self.version_key = (
+            f'recipes:trigram-index:{model._meta.label_lower}:{field}')
+
+    def load(self):
+        postings = {}
+        documents = {}
+        for pk, text in self.model.objects.values_list('pk', self.field):
+            grams = trigrams(text)
+            documents[pk] = (normalize(text), len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(pk)
+        return postings, documents
+
+    def search(self, query, limit):
+        """
+        До limit первичных ключей, отсортированных так: сначала
+        совпадения по префиксу, затем по убыванию сходства.
+        Пока индекс не построен, возвращает None.
+        """
+        data = self.get_data()
+        if data is None:
+            return None
+        postings, documents = data
+        query_grams = trigrams(query)
+        key = normalize(query)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(postings.get(gram, ()))
+        ranked = []
+        for pk, common in shared.items():
+            text, size = documents[pk]
+            similarity = common / (len(query_grams) + size - common)
+            is_prefix = text.startswith(key)
+            if is_prefix or key in text or similarity >= TRIGRAM_THRESHOLD:
+                ranked.append((not is_prefix, -similarity, text, pk))
+        ranked.sort()
+        return [pk for *_, pk in ranked[:limit]]
+
+
+class RecipeIngredientIndex(VersionedIndex):
+    """
+    Обратный индекс составов рецептов для поиска по имеющимся
+    ингредиентам: ингредиент -> отсортированный список id рецептов,
+    плюс состав каждого рецепта (из него берется число ингредиентов).
+
+    Изменения рецептов пишутся в журнал CompositionChange, и индексы
+    процессов догоняют его, перечитывая только измененные рецепты.
+    Версия индекса - id последней записи журнала. Полное построение
+    нужно, если журнал отстал, в нем есть пропуски или запись
+    без рецептов.
+    """
+    def __init__(self):
+        super().__init__()
+        self._pending = local()
+
+    def current_version(self):
+        return CompositionChange.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+
+    def invalidate(self):
+        self.changed(None)
+
+    def load(self):
+        postings = {}
+        compositions = {}
+        for recipe, ingredient in IngredientInRecipe.objects.order_by(
+                'recipe', 'ingredient').values_list('recipe', 'ingredient'):
+            postings.setdefault(ingredient, []).append(recipe)
+            compositions.setdefault(recipe, []).append(ingredient)
+        return postings, compositions
+
+    def changed(self, recipe_ids):
+        """
+        Записывает изменение рецептов в журнал для всех процессов.
+        recipe_ids=None - индексы нужно построить заново.
+        """
+        change = CompositionChange.objects.create(
+            recipe_ids=None if recipe_ids is None else sorted(recipe_ids))
+        CompositionChange.objects.filter(
+            id__lte=change.id - MAX_PENDING_CHANGES).delete()
+
+    def changed_on_commit(self, recipe_id):
+        """
+        Пишет рецепт в журнал после фиксации транзакции. Рецепты копятся
+        в множестве потока, а каждое изменение ставит свой on_commit:
+        первый обработчик пишет все рецепты одной записью, остальные
+        находят множество пустым. Рецепты отмененной транзакции попадут
+        в следующую запись - это лишь лишнее перечитывание.
+        """
+        if not hasattr(self._pending, 'recipe_ids'):
+            self._pending.recipe_ids = set()
+        self._pending.recipe_ids.add(recipe_id)
+        transaction.on_commit(self.flush_pending)
+
+    def flush_pending(self):
+        recipe_ids = getattr(self._pending, 'recipe_ids', None)
+        if recipe_ids:
+            self._pending.recipe_ids = set()
+            self.changed(recipe_ids)
+
+    def get_data(self):
+        state = self._state
+        version = self.current_version()
+        if state is not None and state[0] != version:
+            state = self.catch_up(state[0], version)
+        if state is None or state[0] != version:
+            self.warm_requested = True
+            return None
+        return state[1]
+
+    def catch_up(self, start, version):
+        """
+        Доводит индекс с версии start до version по журналу. Если
+        журнала не хватает, возвращает None.
+        """
+        if not 0 < version - start <= MAX_PENDING_CHANGES:
+            return None
+        changes = list(CompositionChange.objects.filter(
+            id__gt=start, id__lte=version).values_list(
+                'recipe_ids', flat=True))
+        if len(changes) != version - start or None in changes:
+            return None
+        recipe_ids = set().union(*changes)
+        rows = IngredientInRecipe.objects.filter(
+            recipe__in=recipe_ids).values_list('recipe', 'ingredient')
+        with self._lock:
+            state = self._state
+            if state is None or state[0] != start:
+                return state
+            postings, compositions = dict(state[1][0]), dict(state[1][1])
+            for recipe in recipe_ids:
+                for ingredient in compositions.pop(recipe, ()):
+                    postings[ingredient] = [
+                        pk for pk in postings[ingredient] if pk != recipe]
+            for recipe, ingredient in rows:
+                compositions.setdefault(recipe, []).append(ingredient)
+                recipes = list(postings.get(ingredient, ()))
+                bisect.insort(recipes, recipe)
+                postings[ingredient] = recipes
+            self._state = (version, (postings, compositions))
+            return self._state
+
+    def search(self, ingredient_ids, missing):
+        """
+        Рецепты, в которых есть хотя бы один из ingredient_ids и не
+        хватает не больше missing ингредиентов: пары (id, сколько не
+        хватает) от самых полных совпадений. Пока индекс не построен,
+        возвращает None.
+        """
+        data = self.get_data()
+        if data is None:
+            return None
+        postings, compositions = data
+        matched = Counter()
+        for ingredient in set(ingredient_ids):
+            matched.update(postings.get(ingredient, ()))
+        ranked = []
+        for recipe, count in matched.items():
+            lacking = len(compositions[recipe]) - count
+            if lacking <= missing:
+                ranked.append((lacking, -count, -recipe))
+        ranked.sort()
+        return [(-recipe, lacking) for lacking, _, recipe in ranked]
+
+
+ingredient_index = IngredientPrefixIndex()
+ingredient_trigram_index = TrigramIndex(Ingredient, 'name')
+recipe_trigram_index = TrigramIndex(Recipe, 'name')
+recipe_ingredient_index = RecipeIngredientIndex()
+
+INDEXES = (ingredient_index, ingredient_trigram_index, recipe_trigram_index,
+           recipe_ingredient_index)
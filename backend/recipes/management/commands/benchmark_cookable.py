@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.cookable import cookable_sql
+from recipes.indexes import recipe_ingredient_index
+from recipes.models import IngredientInRecipe
+
+
+class Command(BaseCommand):
+    help = ('Сравнение поиска рецептов по имеющимся ингредиентам: '
+            'индекс в памяти против запроса с GROUP BY.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=100,
+            help='Число случайных запросов'
+        )
+        parser.add_argument(
+            '--missing',
+            type=int,
+            default=1,
+            help='Сколько ингредиентов может не хватать'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора запросов'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        recipe_ingredient_index.build()
+        self.stdout.write(
+            f'Построение индекса: {time.perf_counter() - started:.3f} с')
+        _, compositions = recipe_ingredient_index.get_data()
+        if not compositions:
+            raise CommandError('В базе нет рецептов с ингредиентами')
+        queries = self.make_queries(
+            compositions, options['queries'], random.Random(options['seed']))
+        timings = {}
+        for name, search in (
+                ('Индекс', recipe_ingredient_index.search),
+                ('SQL', cookable_sql)):
+            started = time.perf_counter()
+            results = [search(query, options['missing']) for query in queries]
+            timings[name] = (time.perf_counter() - started) / len(queries)
+            if name == 'Индекс':
+                expected = results
+            elif results != expected:
+                raise CommandError('Результаты индекса и SQL расходятся')
+        for name, timing in timings.items():
+            self.stdout.write(f'{name}: {timing * 1000:.2f} мс на запрос')
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс быстрее в {timings["SQL"] / timings["Индекс"]:.1f} раз'))
+
+    @staticmethod
+    def make_queries(compositions, count, generator):
+        """
+        Наборы "что есть дома": состав случайного рецепта без одного
+        ингредиента и с парой случайных лишних.
+        """
+        recipes = list(compositions)
+        ingredients = list(IngredientInRecipe.objects.order_by().values_list(
+            'ingredient', flat=True).distinct())
+        queries = []
+        for _ in range(count):
+            composition = list(compositions[generator.choice(recipes)])
+            generator.shuffle(composition)
+            queries.append(set(composition[1:]) | set(
+                generator.sample(ingredients, min(2, len(ingredients)))))
+        return queries
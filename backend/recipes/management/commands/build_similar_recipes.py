@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes.similar import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Построение таблицы похожих рецептов по составу '
+            'ингредиентов с весами TF-IDF.')
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты построены для {total} рецептов'))
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from recipes.images import generate_variants, variant_names, variants_match
+from recipes.models import Recipe
+from recipes.versions import RECIPES, bump_versions
+from users.models import User
+
+BATCH_SIZE = 500
+TARGETS = (
+    (Recipe, 'image', 'image_variants'),
+    (User, 'avatar', 'avatar_variants'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Построение уменьшенных копий изображений рецептов '
+            'и аватаров в пуле процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить копии даже там, где они уже есть'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов, по умолчанию - число ядер'
+        )
+
+    def handle(self, *args, **options):
+        self.processes = options['processes']
+        with ProcessPoolExecutor(self.processes) as executor:
+            for model, field, variants_field in TARGETS:
+                self.refresh(
+                    executor, model, field, variants_field, options['force'])
+
+    def refresh(self, executor, model, field, variants_field, force):
+        rows = [
+            row for row in
+            model.objects.exclude(**{field: ''}).values_list(
+                'pk', field, variants_field).iterator()
+            if force or not variants_match(row[1], row[2])
+        ]
+        names = [name for _, name, _ in rows]
+        results = executor.map(
+            generate_variants, names,
+            chunksize=max(1, len(names) // (4 * self.processes)))
+        objects, stale = [], set()
+        for (pk, _, old_variants), variants in zip(rows, results):
+            stale |= variant_names(old_variants) - variant_names(variants)
+            objects.append(model(pk=pk, **{variants_field: variants}))
+        model.objects.bulk_update(
+            objects, [variants_field], batch_size=BATCH_SIZE)
+        if objects:
+            bump_versions(RECIPES)
+        for name in stale:
+            default_storage.delete(name)
+        built = sum(1 for obj in objects if getattr(obj, variants_field))
+        self.stdout.write(self.style.SUCCESS(
+            f'{model._meta.verbose_name_plural}: обработано {len(objects)}, '
+            f'копии построены для {built}'
+        ))
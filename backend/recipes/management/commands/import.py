@@ -1,28 +1,138 @@
 import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.indexes import ingredient_index, ingredient_trigram_index
 from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS, bump_versions
+
+DEFAULT_PATH = 'data/ingredients.csv'
+BATCH_SIZE = 5000
+HEADER = ['name', 'measurement_unit']
+
+
+class RowsFile:
+    """Файлоподобный объект для COPY: кодирует строки в csv по мере чтения"""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._data = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._data) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._data += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if size < 0:
+            size = len(self._data)
+        chunk, self._data = self._data[:size], self._data[size:]
+        return chunk
 
 
 class Command(BaseCommand):
-    help = 'Импорт данных из csv файлов в БД.'
+    help = ('Импорт ингредиентов из csv или json файла в БД. '
+            'Уже существующие ингредиенты пропускаются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=DEFAULT_PATH,
+            help='Путь к файлу .csv или .json'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Размер пакета вставки, если COPY недоступен'
+        )
 
     def handle(self, *args, **options):
-        self.import_ingredients()
-
-    def import_ingredients(self):
-        # Ingredient.objects.all().delete()
-        # file_path = '../data/ingredients.csv'
-        # file_path = settings.BASE_DIR / 'data/ingredients.csv'
-        file_path = 'data/ingredients.csv'
-
-        with open(file_path, 'r', encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)
-
-            for row in reader:
-                ingredient = Ingredient.objects.create(
-                    name=row[0],
-                    measurement_unit=row[1]
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден')
+        self.processed = 0
+        started = time.perf_counter()
+        before = Ingredient.objects.count()
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                self.copy_rows(self.read_rows(path))
+            else:
+                self.insert_rows(
+                    self.read_rows(path), options['batch_size'])
+        created = Ingredient.objects.count() - before
+        elapsed = time.perf_counter() - started
+        ingredient_index.invalidate()
+        ingredient_trigram_index.invalidate()
+        bump_versions(INGREDIENTS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {self.processed}, '
+            f'добавлено ингредиентов: {created} '
+            f'за {elapsed:.2f} с '
+            f'({self.processed / max(elapsed, 1e-6):.0f} строк/с)'
+        ))
+
+    def read_rows(self, path):
+        """Пары (название, единица измерения) из файла"""
+        with open(path, 'r', encoding='utf-8') as file:
+            if path.suffix == '.json':
+                rows = (
+                    (item['name'], item['measurement_unit'])
+                    for item in json.load(file)
+                )
+            else:
+                rows = (
+                    row for row in csv.reader(file)
+                    if row and row != HEADER
                 )
-                ingredient.save()
+            for name, measurement_unit in rows:
+                self.processed += 1
+                yield name.strip(), measurement_unit.strip()
+
+    @staticmethod
+    def insert_rows(rows, batch_size):
+        """Пакетная вставка с пропуском существующих ингредиентов"""
+        rows = iter(rows)
+        while True:
+            batch = [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in islice(rows, batch_size)
+            ]
+            if not batch:
+                break
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+
+    @staticmethod
+    def copy_rows(rows):
+        """
+        Загрузка через COPY во временную таблицу и перенос
+        новых ингредиентов одним INSERT ... ON CONFLICT DO NOTHING.
+        """
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE import_ingredient '
+                '(name varchar(128), measurement_unit varchar(64)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY import_ingredient (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                RowsFile(rows)
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT name, measurement_unit FROM import_ingredient '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from recipes.models import IngredientInRecipe, ShoppingListItem
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = ('Пересборка суммарных списков покупок по корзинам '
+            'или сверка их с корзинами (--verify).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить списки покупок, ничего не меняя'
+        )
+
+    @staticmethod
+    def live_amounts():
+        """Суммы ингредиентов, посчитанные по корзинам"""
+        return {
+            (row['recipe__recipe_shopping__user'], row['ingredient']):
+            row['total']
+            for row in IngredientInRecipe.objects.filter(
+                recipe__recipe_shopping__isnull=False
+            ).values(
+                'recipe__recipe_shopping__user', 'ingredient'
+            ).annotate(total=Sum('amount')).order_by().iterator()
+        }
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.verify()
+        else:
+            self.rebuild()
+
+    def verify(self):
+        expected = self.live_amounts()
+        stored = {
+            (user, ingredient): amount
+            for user, ingredient, amount in
+            ShoppingListItem.objects.values_list(
+                'user', 'ingredient', 'amount').iterator()
+        }
+        mismatches = [
+            (key, stored.get(key), expected.get(key))
+            for key in expected.keys() | stored.keys()
+            if stored.get(key) != expected.get(key)
+        ]
+        for (user, ingredient), actual, amount in sorted(mismatches):
+            self.stderr.write(
+                f'Пользователь {user}, ингредиент {ingredient}: '
+                f'сохранено {actual}, ожидается {amount}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Расхождений в списках покупок: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок совпадают с корзинами ({len(stored)} позиций)'))
+
+    @transaction.atomic
+    def rebuild(self):
+        ShoppingListItem.objects.all().delete()
+        items = ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user, ingredient_id=ingredient, amount=amount)
+                for (user, ingredient), amount
+                in self.live_amounts().items()
+            ),
+            batch_size=BATCH_SIZE
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны ({len(items)} позиций)'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.counters import COUNTERS, find_mismatches, reconcile
+
+
+class Command(BaseCommand):
+    help = ('Пересчет денормализованных счетчиков избранного, корзин, '
+            'рецептов и подписчиков или их сверка (--verify).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить счетчики, ничего не меняя'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.verify()
+        else:
+            self.reconcile()
+
+    def verify(self):
+        total = 0
+        for counter in COUNTERS:
+            for obj in find_mismatches(counter).iterator():
+                total += 1
+                self.stderr.write(
+                    f'{counter.model._meta.verbose_name} {obj.pk}, '
+                    f'{counter.field}: сохранено '
+                    f'{getattr(obj, counter.field)}, ожидается {obj.actual}'
+                )
+        if total:
+            raise CommandError(f'Расхождений в счетчиках: {total}')
+        self.stdout.write(self.style.SUCCESS('Счетчики совпадают с данными'))
+
+    @transaction.atomic
+    def reconcile(self):
+        for counter in COUNTERS:
+            fixed = reconcile(counter)
+            self.stdout.write(self.style.SUCCESS(
+                f'{counter.model._meta.verbose_name_plural}, '
+                f'{counter.field}: исправлено {fixed}'
+            ))
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.3 on 2026-10-18 04:44
+
+from django.db import migrations
+from django.db.models import Count, F, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Повторный запуск старой команды import создавал дубли.
+    Ссылки на дубли переносим на ингредиент с меньшим id.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    for group in duplicates:
+        keep = group['keep']
+        others = Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=keep).values_list('id', flat=True)
+        for other in others:
+            for model, owner in ((IngredientInRecipe, 'recipe'),
+                                 (ShoppingListItem, 'user')):
+                rows = model.objects.filter(ingredient=other)
+                kept = dict(model.objects.filter(
+                    ingredient=keep,
+                    **{f'{owner}__in': rows.values(owner)}
+                ).values_list(owner, 'id'))
+                conflicts = rows.filter(**{f'{owner}__in': list(kept)})
+                for owner_id, amount in conflicts.values_list(
+                        owner, 'amount'):
+                    model.objects.filter(id=kept[owner_id]).update(
+                        amount=F('amount') + amount)
+                conflicts.delete()
+                rows.update(ingredient=keep)
+            Ingredient.objects.filter(id=other).delete()
+
+
+class Migration(migrations.Migration):
+    """
+    Слияние дублей идет отдельной миграцией: в PostgreSQL ALTER TABLE
+    нельзя выполнить в транзакции, где удаление строк оставило
+    отложенные проверки внешних ключей.
+    """
+
+    dependencies = [
+        ('recipes', '0014_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.3 on 2026-10-18 04:46
+
+import string
+
+from django.db import migrations, models
+
+ALPHABET = string.digits + string.ascii_letters
+
+
+def encode(number):
+    code = ''
+    while True:
+        number, remainder = divmod(number, len(ALPHABET))
+        code = ALPHABET[remainder] + code
+        if not number:
+            return code
+
+
+def regenerate_short_links(apps, schema_editor):
+    """
+    Старые коды были случайными, могли совпадать и хранились вместе
+    с адресом вида http:/localhost/s/. Заменяем их кодами из id рецепта.
+    """
+    Link = apps.get_model('recipes', 'Link')
+    links = list(Link.objects.all())
+    for link in links:
+        link.short_link = encode(link.recipe_id)
+    Link.objects.bulk_update(links, ('short_link',), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            regenerate_short_links, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='link',
+            name='short_link',
+            field=models.CharField(max_length=20, unique=True, verbose_name='Код короткой ссылки на рецепт'),
+        ),
+    ]
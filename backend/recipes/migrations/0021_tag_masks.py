@@ -0,0 +1,91 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:14
+
+from django.db import migrations, models
+from django.db.models import (BigIntegerField, ExpressionWrapper, F, OuterRef,
+                              Subquery, Sum)
+from django.db.models.functions import Cast, Coalesce
+
+MASK_BITS = 63
+
+# SQLite пересоздает recipes_recipe при добавлении и удалении колонок,
+# и триггеры FTS5 из 0020 пропадают. SQL скопирован сюда, чтобы
+# миграция не зависела от кода приложения.
+SQLITE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert
+    AFTER INSERT ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+)
+
+
+def restore_sqlite_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SQLITE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+def fill_tag_masks(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for bit, tag in enumerate(Tag.objects.order_by('id')[:MASK_BITS]):
+        tag.bit = bit
+        tag.save(update_fields=('bit',))
+    Recipe.objects.update(tags_mask=Coalesce(Subquery(
+        Tag.objects.filter(
+            tag_recipe=OuterRef('pk'), bit__isnull=False
+        ).order_by().values('tag_recipe').annotate(
+            mask=Sum(ExpressionWrapper(
+                Cast(1, BigIntegerField()).bitleftshift(F('bit')),
+                output_field=BigIntegerField()))
+        ).values('mask'),
+        output_field=BigIntegerField()
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_full_text_search'),
+    ]
+
+    operations = [
+        # При откате триггеры восстанавливаются после удаления колонки.
+        migrations.RunPython(
+            migrations.RunPython.noop, restore_sqlite_triggers),
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='Бит в маске тегов рецепта'),
+        ),
+        migrations.RunPython(fill_tag_masks, migrations.RunPython.noop),
+        migrations.RunPython(
+            restore_sqlite_triggers, migrations.RunPython.noop),
+    ]
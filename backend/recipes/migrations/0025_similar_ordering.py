@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0024_feed_ordering'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='similarrecipe',
+            options={'ordering': ('-score', 'similar_id'), 'verbose_name': 'Похожий рецепт', 'verbose_name_plural': 'Похожие рецепты'},
+        ),
+    ]
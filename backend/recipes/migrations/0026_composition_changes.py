@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0025_similar_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompositionChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_ids', models.JSONField(null=True, verbose_name='Рецепты')),
+            ],
+            options={
+                'verbose_name': 'Изменение составов',
+                'verbose_name_plural': 'Изменения составов',
+                'ordering': ('id',),
+            },
+        ),
+    ]
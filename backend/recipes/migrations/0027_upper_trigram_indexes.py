@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# icontains в PostgreSQL сравнивает UPPER(name::text) LIKE ..., и индекс
+# на name для него не годится: поиску и админке нужен свой индекс.
+UPPER_TRIGRAM_INDEXES = (
+    ('recipes_ingredient_upper_name_trgm', 'recipes_ingredient'),
+    ('recipes_recipe_upper_name_trgm', 'recipes_recipe'),
+)
+
+
+def create_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name, table in UPPER_TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} '
+            f'ON {table} USING gin ((UPPER(name::text)) gin_trgm_ops)'
+        )
+
+
+def drop_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name, _ in UPPER_TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0026_composition_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_upper_trigram_indexes, drop_upper_trigram_indexes),
+    ]
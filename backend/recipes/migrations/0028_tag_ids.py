@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# Массив id тегов рецепта для фильтра по тегам в PostgreSQL: условие
+# tag_ids && ARRAY[...] идет по GIN-индексу, в отличие от битовой
+# маски. Колонка живет вне модели, как search_vector из 0020, и
+# поддерживается триггером на recipes_recipe_tags, поэтому
+# каскадные удаления тегов и рецептов ее тоже обновляют.
+POSTGRES_FORWARD = (
+    "ALTER TABLE recipes_recipe "
+    "ADD COLUMN tag_ids integer[] NOT NULL DEFAULT '{}'",
+    """
+    CREATE FUNCTION recipes_recipe_tag_ids() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE recipes_recipe SET tag_ids = ARRAY(
+                SELECT tag_id FROM recipes_recipe_tags
+                WHERE recipe_id = OLD.recipe_id ORDER BY tag_id
+            ) WHERE id = OLD.recipe_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE recipes_recipe SET tag_ids = ARRAY(
+                SELECT tag_id FROM recipes_recipe_tags
+                WHERE recipe_id = NEW.recipe_id ORDER BY tag_id
+            ) WHERE id = NEW.recipe_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_tags_tag_ids
+    AFTER INSERT OR UPDATE OR DELETE ON recipes_recipe_tags
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_tag_ids()
+    """,
+    """
+    UPDATE recipes_recipe SET tag_ids = ARRAY(
+        SELECT tag_id FROM recipes_recipe_tags
+        WHERE recipe_id = recipes_recipe.id ORDER BY tag_id
+    )
+    """,
+    'CREATE INDEX recipes_recipe_tag_ids_idx '
+    'ON recipes_recipe USING gin (tag_ids)',
+)
+POSTGRES_BACKWARD = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_tags_tag_ids '
+    'ON recipes_recipe_tags',
+    'DROP FUNCTION IF EXISTS recipes_recipe_tag_ids()',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS tag_ids',
+)
+
+
+def run_statements(schema_editor, statements):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_tag_ids(apps, schema_editor):
+    run_statements(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_tag_ids(apps, schema_editor):
+    run_statements(schema_editor, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0027_upper_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_tag_ids, drop_tag_ids),
+    ]
@@ -1,5 +1,7 @@
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
 from rest_framework.reverse import reverse
 from users.models import User
 
@@ -20,6 +22,10 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient')]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
@@ -42,6 +48,13 @@ class Tag(models.Model):
             message='Недопустимый символ в Слаге Тега'
         )]
     )
+    bit = models.PositiveSmallIntegerField(
+        verbose_name='Бит в маске тегов рецепта',
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ('name',)
@@ -69,6 +82,12 @@ class Recipe(models.Model):
         verbose_name='Изображение блюда',
         upload_to='recipes/images'
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание рецепта'
     )
@@ -83,6 +102,11 @@ class Recipe(models.Model):
         related_name='tag_recipe',
         verbose_name='Теги'
     )
+    tags_mask = models.BigIntegerField(
+        verbose_name='Маска тегов',
+        default=0,
+        editable=False
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления (в минутах)',
         validators=[
@@ -91,18 +115,31 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
-        verbose_name='Дата публикации',
-        db_index=True
+        verbose_name='Дата публикации'
     )
     direct_link = models.URLField(
         verbose_name='Прямая ссылка на рецепт',
         blank=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В корзинах',
+        default=0,
+        editable=False
+    )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx')]
 
     def __str__(self):
         return self.name
@@ -124,8 +161,8 @@ class Link(models.Model):
     )
     short_link = models.CharField(
         max_length=20,
-        verbose_name='Короткая ссылка на рецепт',
-        unique=False
+        verbose_name='Код короткой ссылки на рецепт',
+        unique=True
     )
 
     class Meta:
@@ -136,6 +173,44 @@ class Link(models.Model):
         return self.short_link
 
 
+class IngredientInRecipeManager(models.Manager):
+    """Менеджер составов рецептов"""
+
+    def set_amounts(self, recipe, amounts):
+        """
+        Приводит ингредиенты рецепта к amounts ({id ингредиента:
+        количество}), меняя только отличающиеся строки. bulk_create
+        и bulk_update не посылают сигналов, поэтому их изменения
+        переносятся в списки покупок здесь; удаленные строки вычитает
+        сигнал post_delete.
+        """
+        current = {row.ingredient_id: row for row in recipe.recipe_list.all()}
+        removed, changed, deltas = [], [], {}
+        for ingredient, row in current.items():
+            if ingredient not in amounts:
+                removed.append(row.pk)
+            elif row.amount != amounts[ingredient]:
+                deltas[ingredient] = amounts[ingredient] - row.amount
+                row.amount = amounts[ingredient]
+                changed.append(row)
+        added = {
+            ingredient: amount for ingredient, amount in amounts.items()
+            if ingredient not in current
+        }
+        deltas.update(added)
+        if removed:
+            self.filter(pk__in=removed).delete()
+        if changed:
+            self.bulk_update(changed, ('amount',))
+        if added:
+            self.bulk_create(
+                self.model(recipe=recipe, ingredient_id=ingredient,
+                           amount=amount)
+                for ingredient, amount in added.items()
+            )
+        ShoppingListItem.objects.change_recipe_amounts(recipe, deltas)
+
+
 class IngredientInRecipe(models.Model):
     """Модель количества ингредиента в рецепте"""
     recipe = models.ForeignKey(
@@ -158,6 +233,8 @@ class IngredientInRecipe(models.Model):
                 1, message='Минимальное значение 1')]
     )
 
+    objects = IngredientInRecipeManager()
+
     class Meta:
         verbose_name = 'Количество ингредиента'
         verbose_name_plural = 'Количество ингредиентов'
@@ -169,6 +246,26 @@ class IngredientInRecipe(models.Model):
     def __str__(self):
         return f'{self.ingredient} – {self.amount}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def stored_values(self):
+        """
+        Рецепт, ингредиент и количество строки в базе: формы меняют
+        поля объекта до сохранения и удаления.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is not None and models.DEFERRED not in loaded.values():
+            return (loaded['recipe_id'], loaded['ingredient_id'],
+                    loaded['amount'])
+        if self.pk is None:
+            return None
+        return IngredientInRecipe.objects.filter(pk=self.pk).values_list(
+            'recipe', 'ingredient', 'amount').first()
+
 
 class BaseModel(models.Model):
     """Базовая модель"""
@@ -225,3 +322,195 @@ class ShoppingCart(BaseModel):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в свою корзину'
+
+
+class ShoppingListItemManager(models.Manager):
+    """Менеджер суммарного списка покупок"""
+
+    @staticmethod
+    def recipe_amounts(recipe):
+        """Количество каждого ингредиента в рецепте"""
+        return dict(IngredientInRecipe.objects.filter(
+            recipe=recipe).values_list('ingredient', 'amount'))
+
+    def change_amounts(self, users, deltas):
+        """
+        Прибавляет deltas ({id ингредиента: количество}) к спискам
+        покупок пользователей users. Недостающие позиции вставляются
+        с нулем без учета конфликтов, затем все позиции сдвигаются
+        одним UPDATE по F('amount'), поэтому параллельные изменения
+        одного списка не теряются и не падают на уникальности.
+        """
+        deltas = {
+            ingredient: delta for ingredient, delta in deltas.items()
+            if delta
+        }
+        if not deltas:
+            return
+        users = list(users)
+        if not users:
+            return
+        added = [
+            ingredient for ingredient, delta in deltas.items() if delta > 0]
+        if added:
+            self.bulk_create(
+                (self.model(user_id=user, ingredient_id=ingredient, amount=0)
+                 for user in users for ingredient in added),
+                ignore_conflicts=True)
+        items = self.filter(user__in=users, ingredient__in=deltas)
+        items.update(amount=Greatest(F('amount') + Case(
+            *(When(ingredient=ingredient, then=Value(delta))
+              for ingredient, delta in deltas.items()),
+            output_field=models.IntegerField()
+        ), 0))
+        items.filter(amount=0).delete()
+
+    def change_recipe_amounts(self, recipe, deltas):
+        """Переносит изменение состава рецепта в списки его корзин"""
+        self.change_amounts(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                'user', flat=True), deltas)
+
+    def add_recipe(self, users, recipe):
+        """Добавляет ингредиенты рецепта в списки покупок users"""
+        self.change_amounts(users, self.recipe_amounts(recipe))
+
+    def remove_recipe(self, users, recipe):
+        """Вычитает ингредиенты рецепта из списков покупок users"""
+        self.change_amounts(users, {
+            ingredient: -amount
+            for ingredient, amount in self.recipe_amounts(recipe).items()
+        })
+
+
+class ShoppingListItem(models.Model):
+    """
+    Суммарное количество ингредиента в списке покупок пользователя.
+    Поддерживается при изменении корзины и рецептов в ней.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Суммарное количество'
+    )
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item')]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} – {self.amount}'
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписчика: рецепт автора, на которого он подписан.
+    Дата публикации скопирована из рецепта, чтобы лента читалась
+    одним проходом по индексу (user, pub_date, recipe).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry')]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx')]
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Похожий рецепт: косинусное сходство наборов ингредиентов
+    с весами TF-IDF. Строится заранее, см. recipes.similar.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(
+        verbose_name='Сходство'
+    )
+
+    class Meta:
+        ordering = ('-score', 'similar_id')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe')]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx')]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}'
+
+
+class CompositionChange(models.Model):
+    """
+    Запись журнала изменений составов рецептов для индекса
+    recipes.indexes.RecipeIngredientIndex. Id записи - версия индекса:
+    последовательность БД выдает номера атомарно всем процессам.
+    Запись без recipe_ids требует полного построения индекса.
+    """
+    recipe_ids = models.JSONField(
+        verbose_name='Рецепты',
+        null=True
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Изменение составов'
+        verbose_name_plural = 'Изменения составов'
+
+    def __str__(self):
+        return f'{self.id}: {self.recipe_ids}'
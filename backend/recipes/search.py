@@ -0,0 +1,64 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Вес совпадений в названии относительно описания для bm25 в SQLite.
+# В Postgres то же задают веса A и B у tsvector.
+NAME_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+WORD = re.compile(r'\w+')
+
+POSTGRES_MATCH = (
+    "SELECT id FROM recipes_recipe "
+    "WHERE search_vector @@ websearch_to_tsquery('russian', %s)"
+)
+POSTGRES_RANK = (
+    "ts_rank(recipes_recipe.search_vector, "
+    "websearch_to_tsquery('russian', %s))"
+)
+SQLITE_MATCH = (
+    'SELECT rowid FROM recipes_recipe_fts '
+    'WHERE recipes_recipe_fts MATCH %s'
+)
+SQLITE_RANK = (
+    f'(SELECT -bm25(recipes_recipe_fts, {NAME_WEIGHT}, {TEXT_WEIGHT}) '
+    'FROM recipes_recipe_fts '
+    'WHERE recipes_recipe_fts MATCH %s AND rowid = recipes_recipe.id)'
+)
+
+
+def fts5_query(value):
+    """
+    Запрос FTS5 из пользовательской строки: все слова обязательны,
+    каждое ищется по префиксу. Слова берутся в кавычки, поэтому
+    операторы FTS5 во вводе не действуют.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(value.lower()))
+
+
+def full_text_search(queryset, value):
+    """
+    Полнотекстовый поиск рецептов по названию и описанию с
+    сортировкой по релевантности. Postgres ищет по tsvector с
+    русской морфологией и GIN-индексом, SQLite - по таблице FTS5.
+    Индексы обновляются триггерами БД, см. миграцию 0020. SQLite
+    теряет триггеры FTS5, когда миграция меняет колонки Recipe;
+    такая миграция должна создать их заново, как 0021.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        match, rank, query = POSTGRES_MATCH, POSTGRES_RANK, value
+    elif vendor == 'sqlite':
+        match, rank, query = SQLITE_MATCH, SQLITE_RANK, fts5_query(value)
+        if not query:
+            return queryset.none()
+    else:
+        return queryset.filter(
+            Q(name__icontains=value) | Q(text__icontains=value))
+    return queryset.filter(
+        pk__in=RawSQL(match, (query,))
+    ).annotate(
+        rank=RawSQL(rank, (query,), output_field=FloatField())
+    ).order_by('-rank', '-pub_date', '-id')
@@ -0,0 +1,28 @@
+import string
+from functools import lru_cache
+
+from .models import Link
+
+ALPHABET = string.digits + string.ascii_letters
+CACHE_SIZE = 4096
+
+
+def encode_short_link(number):
+    """Код короткой ссылки: id рецепта в системе счисления base62"""
+    code = ''
+    while True:
+        number, remainder = divmod(number, len(ALPHABET))
+        code = ALPHABET[remainder] + code
+        if not number:
+            return code
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def resolve_short_link(code):
+    """
+    Адрес рецепта по коду короткой ссылки. Найденные адреса
+    кешируются в процессе; если ссылки нет, поднимается
+    Link.DoesNotExist, и промах не кешируется.
+    """
+    return Link.objects.values_list(
+        'base_link', flat=True).get(short_link=code)
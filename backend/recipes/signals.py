@@ -0,0 +1,235 @@
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from jobs.queue import enqueue
+from users.models import Subscription, User
+
+from .counters import change_counters, counter_scopes
+from .feed import backfill_feed, fan_out_recipe, remove_from_feed
+from .images import delete_variants, image_changed, refresh_variants_job
+from .indexes import (INDEXES, ingredient_index, ingredient_trigram_index,
+                      recipe_ingredient_index, recipe_trigram_index)
+from .models import (Favorite, Ingredient, IngredientInRecipe, Link, Recipe,
+                     ShoppingCart, ShoppingListItem, Tag)
+from .short_links import resolve_short_link
+from .tag_masks import clear_bit, free_bit, refresh_masks
+from .versions import INGREDIENTS, RECIPES, TAGS, bump_versions, user_scope
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_indexes(**kwargs):
+    """Сбрасываем индексы ингредиентов при их изменении"""
+    ingredient_index.invalidate()
+    ingredient_trigram_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_indexes(**kwargs):
+    """Сбрасываем индекс названий рецептов при их изменении"""
+    recipe_trigram_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def log_recipe_composition(sender, instance, **kwargs):
+    """
+    Индекс составов перечитывает рецепт после фиксации транзакции,
+    когда ингредиенты, созданные bulk_create, уже в базе. Все
+    изменения транзакции попадают в журнал одной записью.
+    """
+    recipe_ingredient_index.changed_on_commit(
+        instance.pk if sender is Recipe else instance.recipe_id)
+
+
+IMAGE_FIELDS = {
+    Recipe: ('image', 'image_variants'),
+    User: ('avatar', 'avatar_variants'),
+}
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=User)
+def mark_changed_image(sender, instance, **kwargs):
+    instance._image_changed = image_changed(instance, IMAGE_FIELDS[sender][0])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def enqueue_image_variants(sender, instance, **kwargs):
+    """
+    Уменьшенные копии нового изображения строит воркер очереди,
+    чтобы обработка файлов не входила во время ответа.
+    """
+    if getattr(instance, '_image_changed', False):
+        enqueue(
+            refresh_variants_job, sender._meta.label_lower, instance.pk,
+            *IMAGE_FIELDS[sender])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def delete_image_variants(sender, instance, **kwargs):
+    """Копии удаленного объекта удаляются после фиксации транзакции"""
+    variants = getattr(instance, IMAGE_FIELDS[sender][1])
+    if variants:
+        transaction.on_commit(lambda: delete_variants(variants))
+
+
+@receiver(post_save, sender=Recipe)
+def enqueue_feed_fan_out(instance, created, **kwargs):
+    """Ленты подписчиков заполняет воркер очереди"""
+    if created:
+        enqueue(fan_out_recipe, instance.pk)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_subscriber_feed(instance, created, **kwargs):
+    if created:
+        backfill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_subscriber_feed(instance, **kwargs):
+    remove_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Link)
+def clear_short_link_cache(**kwargs):
+    """Удаленная ссылка не должна открываться из кеша"""
+    resolve_short_link.cache_clear()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipes_version(**kwargs):
+    bump_versions(RECIPES)
+
+
+@receiver(pre_save, sender=Tag)
+def assign_tag_bit(instance, **kwargs):
+    if instance.bit is None:
+        instance.bit = free_bit()
+
+
+@receiver(post_delete, sender=Tag)
+def release_tag_bit(instance, **kwargs):
+    if instance.bit is not None:
+        clear_bit(instance.bit)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tag_masks(instance, action, reverse, pk_set, **kwargs):
+    """Маска тегов рецепта меняется вместе с recipe.tags"""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_recipes = list(
+            instance.tag_recipe.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if pk_set is not None and not pk_set:
+        return
+    if not reverse:
+        refresh_masks([instance.pk])
+    elif action == 'post_clear':
+        refresh_masks(instance._cleared_recipes)
+    else:
+        refresh_masks(pk_set)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    bump_versions(TAGS, RECIPES)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    bump_versions(INGREDIENTS, RECIPES)
+
+
+@receiver((post_save, post_delete), sender=User)
+def bump_authors_version(update_fields=None, **kwargs):
+    """Данные автора выводятся в рецептах; вход в систему не в счет"""
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_versions(RECIPES)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def bump_user_version(instance, **kwargs):
+    bump_versions(user_scope(instance.user_id))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Subscription)
+def update_counters(sender, instance, signal, created=True, **kwargs):
+    """
+    Счетчики избранного, корзин, рецептов и подписчиков меняются
+    в той же транзакции, что и сами записи; ответы с этими
+    счетчиками получают новую версию.
+    """
+    if created:
+        change_counters(sender, instance, 1 if signal is post_save else -1)
+        bump_versions(*counter_scopes(sender, instance))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            [instance.user_id], instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """
+    Корзина и состав рецепта вычитаются после удаления своих строк:
+    при каскадном удалении рецепта каждая пара корзина-ингредиент
+    вычитается ровно один раз, в каком бы порядке ни удалялись строки.
+    """
+    ShoppingListItem.objects.remove_recipe(
+        [instance.user_id], instance.recipe_id)
+
+
+@receiver(pre_save, sender=IngredientInRecipe)
+@receiver(pre_delete, sender=IngredientInRecipe)
+def remember_ingredient_amount(instance, **kwargs):
+    instance._stored_values = instance.stored_values()
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def shopping_lists_follow_ingredient(instance, **kwargs):
+    """Списки покупок следуют за старым и новым рецептом строки"""
+    changes = {}
+    if instance._stored_values is not None:
+        recipe, ingredient, amount = instance._stored_values
+        changes[recipe] = {ingredient: -amount}
+    deltas = changes.setdefault(instance.recipe_id, {})
+    deltas[instance.ingredient_id] = deltas.get(
+        instance.ingredient_id, 0) + instance.amount
+    for recipe, deltas in changes.items():
+        ShoppingListItem.objects.change_recipe_amounts(recipe, deltas)
+    instance._loaded_values = {
+        'recipe_id': instance.recipe_id,
+        'ingredient_id': instance.ingredient_id,
+        'amount': instance.amount,
+    }
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def shopping_lists_drop_ingredient(instance, **kwargs):
+    if instance._stored_values is not None:
+        recipe, ingredient, amount = instance._stored_values
+        ShoppingListItem.objects.change_recipe_amounts(
+            recipe, {ingredient: -amount})
+
+
+@receiver(request_finished)
+def warm_indexes(**kwargs):
+    """Строим индексы после ответа, если запрос ушел в ORM"""
+    for index in INDEXES:
+        index.warm_if_requested()
@@ -0,0 +1,161 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from jobs.queue import job
+
+from .models import IngredientInRecipe, SimilarRecipe
+
+BATCH_SIZE = 500
+# Ингредиенты, которые есть в большей части рецептов (соль, вода),
+# почти не влияют на сходство, но дают каждому рецепту в кандидаты
+# всю таблицу. Их пропускаем, как стоп-слова.
+COMMON_SHARE = 0.5
+COMMON_MIN_COUNT = 50
+
+
+def common_limit(total):
+    """Сколько рецептов может быть у ингредиента, чтобы он учитывался"""
+    return max(COMMON_SHARE * total, COMMON_MIN_COUNT)
+
+
+class IngredientVectors:
+    """
+    Разреженная матрица рецепт x ингредиент с весами TF-IDF: чем
+    реже ингредиент, тем больше его вес. Строки нормированы, так что
+    скалярное произведение строк - косинусное сходство. Матрица
+    хранится по строкам и по столбцам, поэтому сходство рецепта
+    считается только с рецептами, у которых есть общие ингредиенты.
+    """
+
+    def __init__(self, pairs, frequency=None, total=None):
+        """
+        pairs - пары (рецепт, ингредиент). frequency (ингредиент ->
+        число рецептов) и total (число рецептов) считаются по pairs,
+        если не переданы.
+        """
+        compositions = defaultdict(set)
+        for recipe, ingredient in pairs:
+            compositions[recipe].add(ingredient)
+        if frequency is None:
+            total = len(compositions)
+            frequency = Counter(
+                ingredient for ingredients in compositions.values()
+                for ingredient in ingredients)
+        common = common_limit(total)
+        idf = {
+            ingredient: math.log((1 + total) / (1 + count)) + 1
+            for ingredient, count in frequency.items() if count <= common
+        }
+        self.rows = {}
+        self.columns = defaultdict(list)
+        for recipe, ingredients in compositions.items():
+            weights = {
+                ingredient: idf[ingredient]
+                for ingredient in ingredients if ingredient in idf}
+            norm = math.sqrt(sum(weight ** 2 for weight in weights.values()))
+            row = {
+                ingredient: weight / norm
+                for ingredient, weight in weights.items()} if norm else {}
+            self.rows[recipe] = row
+            for ingredient, weight in row.items():
+                self.columns[ingredient].append((recipe, weight))
+
+    @classmethod
+    def load(cls):
+        return cls(IngredientInRecipe.objects.order_by().values_list(
+            'recipe', 'ingredient').iterator(chunk_size=10000))
+
+    @classmethod
+    def load_around(cls, recipe_ids):
+        """
+        Векторы рецептов recipe_ids и рецептов, у которых с ними есть
+        общие значимые ингредиенты. Частоты ингредиентов считает БД
+        агрегатом, так что веса и соседи recipe_ids те же, что при
+        загрузке всей таблицы.
+        """
+        frequency = dict(IngredientInRecipe.objects.order_by().values(
+            'ingredient').annotate(
+                total=Count('recipe', distinct=True)).values_list(
+                    'ingredient', 'total'))
+        total = IngredientInRecipe.objects.order_by().values(
+            'recipe').distinct().count()
+        common = common_limit(total)
+        rare = [
+            ingredient for ingredient in IngredientInRecipe.objects.filter(
+                recipe__in=recipe_ids).values_list('ingredient', flat=True)
+            if frequency[ingredient] <= common
+        ]
+        candidates = IngredientInRecipe.objects.filter(
+            ingredient__in=rare).values('recipe')
+        return cls(
+            IngredientInRecipe.objects.filter(
+                Q(recipe__in=recipe_ids) | Q(recipe__in=candidates)
+            ).order_by().values_list('recipe', 'ingredient'),
+            frequency, total)
+
+    def scores(self, recipe):
+        """Сходство рецепта с рецептами, у которых есть общие ингредиенты"""
+        scores = defaultdict(float)
+        for ingredient, weight in self.rows.get(recipe, {}).items():
+            for other, other_weight in self.columns[ingredient]:
+                scores[other] += weight * other_weight
+        scores.pop(recipe, None)
+        return scores
+
+    def neighbours(self, recipe, count):
+        """count самых похожих рецептов: пары (id, сходство)"""
+        return heapq.nlargest(
+            count, self.scores(recipe).items(),
+            key=lambda item: (item[1], -item[0]))
+
+
+def store(vectors, recipe_ids, count):
+    """Заменяет соседей рецептов recipe_ids блоками по BATCH_SIZE"""
+    recipe_ids = sorted(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        block = recipe_ids[start:start + BATCH_SIZE]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe__in=block).delete()
+            SimilarRecipe.objects.bulk_create(
+                SimilarRecipe(recipe_id=recipe, similar_id=other, score=score)
+                for recipe in block
+                for other, score in vectors.neighbours(recipe, count))
+
+
+def rebuild():
+    """Полное построение таблицы соседей. Возвращает число рецептов"""
+    vectors = IngredientVectors.load()
+    store(vectors, vectors.rows, settings.SIMILAR_RECIPES_COUNT)
+    SimilarRecipe.objects.exclude(recipe__in=vectors.rows.keys()).delete()
+    return len(vectors.rows)
+
+
+@job
+def refresh_similar_recipes(recipe_id):
+    """
+    Обновляет соседей после сохранения рецепта: его собственных и
+    тех рецептов, в чей список он теперь входит или входил раньше.
+    Из БД читаются только рецепты с общими ингредиентами. Веса
+    остальных рецептов сдвигаются мало и уточняются при полном
+    пересчете командой build_similar_recipes.
+    """
+    count = settings.SIMILAR_RECIPES_COUNT
+    scores = IngredientVectors.load_around([recipe_id]).scores(recipe_id)
+    affected = {recipe_id}
+    affected.update(SimilarRecipe.objects.filter(
+        similar=recipe_id).values_list('recipe', flat=True))
+    current = {
+        row['recipe']: row for row in SimilarRecipe.objects.filter(
+            recipe__in=list(scores)
+        ).order_by().values('recipe').annotate(
+            total=Count('pk'), lowest=Min('score'))
+    }
+    for other, score in scores.items():
+        row = current.get(other)
+        if row is None or row['total'] < count or score > row['lowest']:
+            affected.add(other)
+    store(IngredientVectors.load_around(affected), affected, count)
@@ -0,0 +1,83 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import connections
+from django.db.models import (BigIntegerField, ExpressionWrapper, F,
+                              IntegerField, OuterRef, Subquery, Sum)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Recipe, Tag
+
+# Старший бит BigIntegerField знаковый, поэтому тегам отводится 63 бита.
+# Тегам сверх лимита бит не достается, и фильтр по ним идет через JOIN.
+MASK_BITS = 63
+# Массив id тегов с GIN-индексом, только в PostgreSQL, см. миграцию 0028.
+TAG_IDS = RawSQL(
+    'recipes_recipe.tag_ids', (), output_field=ArrayField(IntegerField()))
+
+
+def free_bit():
+    """Младший свободный бит или None, если все заняты"""
+    used = set(Tag.objects.exclude(bit=None).values_list('bit', flat=True))
+    return next((bit for bit in range(MASK_BITS) if bit not in used), None)
+
+
+def tags_mask(tags):
+    """Маска набора тегов или None, если у какого-то тега нет бита"""
+    mask = 0
+    for tag in tags:
+        if tag.bit is None:
+            return None
+        mask |= 1 << tag.bit
+    return mask
+
+
+def actual_mask():
+    """Подзапрос с маской по фактическим тегам рецепта"""
+    return Coalesce(Subquery(
+        Tag.objects.filter(
+            tag_recipe=OuterRef('pk'), bit__isnull=False
+        ).order_by().values('tag_recipe').annotate(
+            mask=Sum(ExpressionWrapper(
+                Cast(1, BigIntegerField()).bitleftshift(F('bit')),
+                output_field=BigIntegerField()))
+        ).values('mask'),
+        output_field=BigIntegerField()
+    ), 0)
+
+
+def refresh_masks(recipe_ids):
+    """Пересчитывает маски рецептов одним UPDATE"""
+    Recipe.objects.filter(pk__in=recipe_ids).update(tags_mask=actual_mask())
+
+
+def clear_bit(bit):
+    """Снимает бит удаленного тега со всех рецептов"""
+    with_bit(Recipe.objects.all(), 1 << bit).update(
+        tags_mask=F('tags_mask').bitand(~(1 << bit)))
+
+
+def with_bit(queryset, mask):
+    """
+    Рецепты, у которых в маске есть хотя бы один бит mask. Условие
+    tags_mask & mask > 0 не использует индекс: это проверка каждой
+    строки при просмотре recipes_recipe в порядке сортировки.
+    """
+    return queryset.alias(tags_match=ExpressionWrapper(
+        F('tags_mask').bitand(mask), output_field=BigIntegerField()
+    )).filter(tags_match__gt=0)
+
+
+def filter_by_tags(queryset, tags):
+    """
+    Рецепты с любым из тегов одним условием вместо JOIN с
+    recipes_recipe_tags, поэтому без дублей и DISTINCT. В PostgreSQL
+    это пересечение массива tag_ids по GIN-индексу, в остальных БД -
+    проверка маски tags_mask без индекса.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        return queryset.alias(tag_ids=TAG_IDS).filter(
+            tag_ids__overlap=[tag.pk for tag in tags])
+    mask = tags_mask(tags)
+    if mask is None:
+        return queryset.filter(tags__in=tags).distinct()
+    return with_bit(queryset, mask)
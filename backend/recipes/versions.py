@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'recipes:data-version:{}'
+CHANGED_KEY = 'recipes:data-changed:{}'
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+# Счетчики избранного, корзин и подписчиков меняются при каждой записи
+# пользователей. Их версия сдвигается не чаще раза
+# в COUNTERS_VERSION_INTERVAL секунд, иначе кеши списков не попадали бы.
+COUNTERS_SCOPE = 'counters'
+THROTTLED_SCOPES = (COUNTERS_SCOPE,)
+
+
+def user_scope(user_id):
+    """Область версии состояния пользователя: избранное, корзина, подписки"""
+    return f'user:{user_id}'
+
+
+def get_versions(*scopes):
+    """
+    Версии областей данных - время их последнего изменения.
+    Если версии в кеше нет, она начинается с текущего момента.
+    """
+    keys = {scope: VERSION_KEY.format(scope) for scope in scopes}
+    changed_keys = {
+        scope: CHANGED_KEY.format(scope)
+        for scope in scopes if scope in THROTTLED_SCOPES
+    }
+    versions = cache.get_many([*keys.values(), *changed_keys.values()])
+    missing = {
+        key: time.time() for key in keys.values() if key not in versions}
+    for key, version in missing.items():
+        cache.add(key, version, timeout=None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    for scope, changed_key in changed_keys.items():
+        versions[keys[scope]] = publish_changes(
+            keys[scope], versions[keys[scope]], versions.get(changed_key))
+    return [versions[keys[scope]] for scope in scopes]
+
+
+def publish_changes(key, version, changed):
+    """
+    Версия области с ограниченной частотой: изменения после нее
+    публикуются первым чтением, когда с прошлой публикации прошло
+    COUNTERS_VERSION_INTERVAL секунд.
+    """
+    now = time.time()
+    if changed is None or changed <= version or (
+            now - version < settings.COUNTERS_VERSION_INTERVAL):
+        return version
+    cache.set(key, now, timeout=None)
+    return now
+
+
+def bump_versions(*scopes):
+    """Обновляет версии после фиксации текущей транзакции"""
+    def bump():
+        version = time.time()
+        cache.set_many(
+            {
+                (CHANGED_KEY if scope in THROTTLED_SCOPES
+                 else VERSION_KEY).format(scope): version
+                for scope in scopes
+            },
+            timeout=None
+        )
+    transaction.on_commit(bump)
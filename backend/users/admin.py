@@ -1,4 +1,5 @@
 from django.contrib import admin
+from recipes.paginators import EstimatedCountPaginator
 
 from .models import Subscription, User
 
@@ -10,23 +11,32 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'avatar',
-        'role',)
+        'role',
+        'recipes_count',
+        'followers_count',)
     list_editable = ('role',)
     search_fields = ('username', 'email')
     list_filter = ()
     list_display_links = ('username',)
     empty_value_display = 'Не задано'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = (
         'user',
-        'author',)
-    # list_editable = ('user',)
-    search_fields = ('user', 'author')
+        'author',
+        'subscription_date',)
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username__exact', 'user__email__exact',
+                     'author__username__exact', 'author__email__exact')
     list_filter = ()
-    # list_display_links = ('user',)
+    list_display_links = ('user',)
+    autocomplete_fields = ('user', 'author')
     empty_value_display = 'Не задано'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(User, UserAdmin)
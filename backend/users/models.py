@@ -42,12 +42,28 @@ class User(AbstractUser):
         upload_to='users/avatars',
         blank=True
     )
+    avatar_variants = models.JSONField(
+        verbose_name='Уменьшенные копии аватара',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     role = models.CharField(
         verbose_name='Пользовательская роль',
         max_length=15,
         choices=ROLES,
         default=USER
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name', 'password']
@@ -81,13 +97,17 @@ class Subscription(models.Model):
     )
 
     class Meta:
-        ordering = ('subscription_date',)
+        ordering = ('subscription_date', 'id')
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
                 name='unique_user_subscription')]
+        indexes = [
+            models.Index(
+                fields=['user', 'subscription_date', 'id'],
+                name='subscription_user_date_idx')]
 
     def __str__(self):
         return f'{self.user} подписался на {self.author}'